@@ -1,61 +1,63 @@
+import sys
 import datetime
-import requests
-import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.dates import MO
 import matplotlib.ticker as mticker
+from .data import load_charts
+from .stats import ratio
+from .cube import as_cube, GRAIN_DAYS
+from .rolling import moving_averages
+from .manifest import date_window
+from .template import Template, set_line, set_fill, source_note, GRAIN_TITLES
 
-uri = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_AdmissionDischarge.csv'
-
-def is_uri_ok(uri_string, print_error=True):
-  try:
-    r = requests.head(uri_string)
-    r.raise_for_status()
-    return True
-  except requests.exceptions.RequestException as error:
-    if print_error:
-      print(error)
-    pass
-  return False
-
-if is_uri_ok(uri):
-  raw = pd.read_csv(uri, sep=';', index_col=0) # error_bad_lines=False
-  
-  release_date = raw['Date'].values[0]
-  
-  # --- Set Data range -> start from date
-  # row_no = raw.loc[raw['Date'] == '2021-08-01'].last_valid_index()
-  # raw = raw.drop(raw.index[row_no:])
-
-  # --- Convert date to datetime
-  raw['Date'] = raw['Date'].apply(pd.to_datetime)
-
-  # --- Cleansing raw
-  raw['Vaccinated'] = raw['Vaccinated'].fillna(value='unknown') # Replace NaN with word unknown
-  #raw['age_group'] = raw['age_group'].fillna(value=55) # Replace NaN with value 55 (average age of unvaccinated COVID-19 patient) - currently in use in Daily admissions axis only
-  raw['age_group'] = raw['age_group']+5 # Middle value of age_group (e.g. age_group 0 = 0-10 age --> will be 5)
-  raw = raw.loc[~(raw['Admissions'] == 0)] # Remove unnecessary zero admissions
+DATASET = 'admissions'
+GRAIN = 'D' # Frames are indexed by date, or by first date of period of coarser grain ('W', 'M', 'Q')
+WINDOW = 7 # Moving average window (periods of GRAIN)
+XLIM = (datetime.datetime(2021, 8, 1), datetime.datetime(2022, 5, 1)) # Visible date range
+YLIM = [(40, 90), (0, 500)] # Y axis range of axis 0, 1
+COLORS = ['#FFC1C2','#dc0002']
+OUTPUT = './res/Hospitalizations/Admissions_Age_WAverage_Basic_Daily.png'
+
+# Dates read from data set (data.load_charts) - visible range with moving average warm-up
+def dates():
+  return date_window(XLIM, GRAIN, WINDOW)
+
+# Per period (GRAIN) values, each period is computed from its own rows only (raw rows or their cube.Cube)
+def aggregate(raw):
+  cube = as_cube(raw).rollup(GRAIN)
+  cube = cube.select(cube.sum() != 0) # Remove dates with zero admissions only
 
   # --- Daily Admissions - Axis 1
   df = pd.DataFrame()
-  df['Admissions'] = raw['Admissions'].groupby(raw['Date']).sum()
-  df['Admissions_ma7'] = df['Admissions'].rolling(7, closed='left').mean()
+  df['Admissions'] = cube.frame(cube.sum())
 
   # --- Daily weighten average age_group - Axis 0
-  raw = raw.dropna(subset=['age_group']) # Additional cleansing before weighten average --> Remove NaN for proper calculation
-  df['age_group_WAverage'] = raw.groupby(raw['Date']).apply(lambda x: np.average(x.age_group, weights=x.Admissions))
-  df['age_group_WAverage_ma7'] = df['age_group_WAverage'].rolling(7, closed='left').mean()
+  qty, age_sum, _ = cube.weighted_sums()
+  df['age_group_WAverage'] = ratio(cube.frame(age_sum), cube.frame(qty)) # Unknown age slot is left out
+
+  return {'df': df}
 
+# Moving averages of both columns - previous WINDOW rows, closed='left'
+def moving_average(frames):
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
+  df = frames['df']
+  df = pd.concat([df, moving_averages(df, WINDOW)], axis=1)[['Admissions', 'Admissions_' + ma, 'age_group_WAverage', 'age_group_WAverage_' + ma]]
+  return {'df': df}
 
+def prepare(raw):
+  return moving_average(aggregate(raw))
+
+def layout():
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
   # --- Plot figure
   fig, axs = plt.subplots(2, 1, figsize=(10, 8))
-  plt.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.99, hspace=0.06)
+  fig.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.99, hspace=0.06)
 
   # Common axis settings:
   for ax in axs:
-    ax.set_prop_cycle(color=['#FFC1C2','#dc0002'])
+    ax.set_prop_cycle(color=COLORS)
     # Grid, major and minor ticks settings
     ax.grid(visible=True, which='both')
     ax.minorticks_on()
@@ -70,39 +72,65 @@ if is_uri_ok(uri):
       label.set(rotation=0, horizontalalignment='center')
     # Set x axis range
     xlimoOffset = datetime.timedelta(days=7)
-    ax.set_xlim(datetime.datetime(2021, 8, 1) - xlimoOffset, datetime.datetime(2022, 5, 1) + xlimoOffset)
-  
+    ax.set_xlim(XLIM[0] - xlimoOffset, XLIM[1] + xlimoOffset)
+
   # 0. Axis - Daily weighten average age
   ax = axs[0]
-  ax.plot(df['age_group_WAverage'], label='Daily')
-  ax.plot(df['age_group_WAverage_ma7'], label='Daily_ma7')
-  ax.set_title('Slovakia Covid Hospital Admission Daily - age_group Weighted Average & ma7', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
+  age, = ax.plot([], [], label='Daily')
+  age_ma, = ax.plot([], [], label='Daily_' + ma)
+  ax.set_title('Slovakia Covid Hospital Admission ' + GRAIN_TITLES[GRAIN] + ' - age_group Weighted Average & ' + ma, loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
   ax.set_xticklabels([])
   ax.yaxis.set_major_locator(mticker.MultipleLocator(10))
   ax.yaxis.set_minor_locator(mticker.MultipleLocator(2))
   # ax.legend(loc='upper right')
   ax.set_xlabel(None)
   ax.set_ylabel("Age")
-  ax.set_ylim(40, 90)
+  ax.set_ylim(*YLIM[0])
 
   # 1. Axis - Daily admissions
   ax = axs[1]
-  ax.plot(df['Admissions'], label='Admissions')
-  ax.plot(df['Admissions_ma7'], label='Admissions_ma7')
-  ax.fill_between(x=df['Admissions'].index, y1=df['Admissions'].values)
-  ax.set_title('Slovakia Covid Hospital Admission Daily & ma7', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
-  ax.yaxis.set_major_locator(mticker.MultipleLocator(100))
-  ax.yaxis.set_minor_locator(mticker.MultipleLocator(20))
+  adm, = ax.plot([], [], label='Admissions')
+  adm_ma, = ax.plot([], [], label='Admissions_' + ma)
+  adm_fill = ax.fill_between(x=[], y1=[])
+  ax.set_title('Slovakia Covid Hospital Admission ' + GRAIN_TITLES[GRAIN] + ' & ' + ma, loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
+  days = GRAIN_DAYS[GRAIN] # Admissions per period - range and ticks of daily admissions times days of period
+  ax.yaxis.set_major_locator(mticker.MultipleLocator(100*days))
+  ax.yaxis.set_minor_locator(mticker.MultipleLocator(20*days))
   ax.set_xlabel(None)
   ax.set_ylabel("Admissions", labelpad=0)
-  ax.set_ylim(0, 500)
+  ax.set_ylim(YLIM[1][0]*days, YLIM[1][1]*days)
 
   # Note inside plot
-  ax.annotate('Source: github.com/Institut-Zdravotnych-Analyz/covid19-data (' + str(release_date) + ')',
+  note = ax.annotate(source_note(''),
                 xy = (1.0, -0.12),
                 xycoords='axes fraction',
                 ha='right',
                 va="center",
                 fontsize=8)
 
-  plt.savefig('./res/Hospitalizations/Admissions_Age_WAverage_Basic_Daily.png')
\ No newline at end of file
+  return fig, {'age': age, 'age_ma': age_ma, 'adm': adm, 'adm_ma': adm_ma, 'adm_fill': adm_fill, 'note': note}
+
+def update(artists, frames, release_date):
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
+  df = frames['df']
+
+  set_line(artists['age'], df['age_group_WAverage'])
+  set_line(artists['age_ma'], df['age_group_WAverage_' + ma])
+  set_line(artists['adm'], df['Admissions'])
+  set_line(artists['adm_ma'], df['Admissions_' + ma])
+  artists['adm_fill'] = set_fill(artists['adm_fill'], df['Admissions'].index, df['Admissions'].values)
+  artists['note'].set_text(source_note(release_date))
+
+TEMPLATE = Template(layout, update)
+
+def plot(frames, release_date):
+  return TEMPLATE.plot(frames, release_date)
+
+def render(frames, release_date, output=OUTPUT):
+  TEMPLATE.render(frames, release_date, output)
+
+if __name__ == '__main__':
+  data = load_charts(DATASET, [sys.modules[__name__]])
+  if data is not None:
+    raw, release_date, _ = data
+    render(prepare(raw), release_date)
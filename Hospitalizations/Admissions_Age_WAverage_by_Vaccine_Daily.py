@@ -1,99 +1,68 @@
+import sys
 import datetime
-import requests
-import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.dates import MO
 import matplotlib.ticker as mticker
-
-uri = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_AdmissionDischarge.csv'
-
-def is_uri_ok(uri_string, print_error=True):
-  try:
-    r = requests.head(uri_string)
-    r.raise_for_status()
-    return True
-  except requests.exceptions.RequestException as error:
-    if print_error:
-      print(error)
-    pass
-  return False
-
-if is_uri_ok(uri):
-  raw = pd.read_csv(uri, sep=';', index_col=0) # error_bad_lines=False
-  
-  release_date = raw['Date'].values[0]
-  
-  # --- Set Data range -> start from date
-  # row_no = raw.loc[raw['Date'] == '2021-08-01'].last_valid_index()
-  # raw = raw.drop(raw.index[row_no:])
-
-  # --- Convert date to datetime
-  raw['Date'] = raw['Date'].apply(pd.to_datetime)
-
-  # --- Cleansing raw
-  raw['Vaccinated'] = raw['Vaccinated'].fillna(value='unknown') # Replace NaN with word unknown
-  #raw['age_group'] = raw['age_group'].fillna(value=55) # Replace NaN with value 55 (average age of unvaccinated COVID-19 patient) - currently in use in Daily admissions axis only
-  raw['age_group'] = raw['age_group']+5 # Middle value of age_group (e.g. age_group 0 = 0-10 age --> will be 5)
-
-  # --- Sum Vaccine status (True/False) on Admissions - Axis 0
-  p = pd.pivot_table(raw, index=['Date', 'age_group'] , columns=['Vaccinated'], values='Admissions', aggfunc=np.sum, fill_value=0, dropna=False)
-  p = p.rename(columns={False:'unvaccinated', True:'vaccinated'})
-  p = p.reset_index(1)
-  p['age_group'] = p['age_group'].astype(np.int8)
-  
-  # - Split Data into categories
-  wa_unvaccinated = p.loc[~(p['unvaccinated'] == 0)]
-
-  wa_vaccinated = p.loc[~(p['vaccinated'] == 0)]
-
-  unk = p.loc[~(p['unknown'] == 0)]
-
-  # - Calculate Average by weights for each Age category
-  wa_unvaccinated = wa_unvaccinated.groupby(wa_unvaccinated.index).apply(lambda x: np.average(x.age_group, weights=x.unvaccinated))
-  wa_unvaccinated = wa_unvaccinated.rename('unvaccinated')
-
-  wa_vaccinated = wa_vaccinated.groupby(wa_vaccinated.index).apply(lambda x: np.average(x.age_group, weights=x.vaccinated))
-  wa_vaccinated = wa_vaccinated.rename('vaccinated')
-
-  unk = unk.groupby(unk.index).apply(lambda x: np.average(x.age_group, weights=x.unknown))
-  unk = unk.rename('unknown')
-
-  # - Result weighten average age
-  result = pd.DataFrame.join(wa_unvaccinated.to_frame(), wa_vaccinated.to_frame(), on='Date')
-  result = result.join(unk.to_frame(), on='Date')
-
-  # - Moving average
-  result['unvaccinated_ma7'] = result['unvaccinated'].rolling(7, closed='left').mean()
-  result['vaccinated_ma7'] = result['vaccinated'].rolling(7, closed='left').mean()
-  result['unknown_ma7'] = result['unknown'].rolling(7, closed='left').mean()
-
-  # --- Sum admissions Daily - Axis 1
-  raw['age_group'] = raw['age_group'].fillna(value=55) # Cleanse raw
-  pA = pd.pivot_table(raw, index=['Date', 'age_group'] , columns=['Vaccinated'], values='Admissions', aggfunc=np.sum, fill_value=0, dropna=False)
-  pA = pA.rename(columns={False:'unvaccinated', True:'vaccinated'})
-
-  resultAD = pd.DataFrame()
-  resultAD['unvaccinated_adm'] = pA['unvaccinated'].groupby(level=['Date']).sum()
-  resultAD['vaccinated_adm'] = pA['vaccinated'].groupby(level=['Date']).sum()
-  resultAD['unknown_adm'] = pA['unknown'].groupby(level=['Date']).sum()
-
-  # - Moving average
-  resultAD['unvaccinated_adm_ma7'] = resultAD['unvaccinated_adm'].rolling(7, closed='left').mean()
-  resultAD['vaccinated_adm_ma7'] = resultAD['vaccinated_adm'].rolling(7, closed='left').mean()
-  resultAD['unknown_adm_ma7'] = resultAD['unknown_adm'].rolling(7, closed='left').mean()
-
-  # print(result)
-  # print(resultAD)
-
+from .data import load_charts, VACCINATED
+from .stats import ratio
+from .cube import as_cube, GRAIN_DAYS
+from .rolling import moving_averages
+from .manifest import date_window
+from .template import Template, set_line, set_fill, source_note, GRAIN_TITLES
+
+DATASET = 'admissions'
+GRAIN = 'D' # Frames are indexed by date, or by first date of period of coarser grain ('W', 'M', 'Q')
+WINDOW = 7 # Moving average window (periods of GRAIN)
+XLIM = (datetime.datetime(2021, 8, 1), datetime.datetime(2022, 5, 1)) # Visible date range
+YLIM = [(40, 90), (0, 500)] # Y axis range of axis 0, 1
+COLORS = ['#D9D9D9','#A4DBFD','#FFDFA4','#6b6b6b','#069af3','#ffa500']
+OUTPUT = './res/Hospitalizations/Admissions_Age_WAverage_by_Vaccine_Daily.png'
+
+# Dates read from data set (data.load_charts) - visible range with moving average warm-up
+def dates():
+  return date_window(XLIM, GRAIN, WINDOW)
+
+# Per period (GRAIN) values, each period is computed from its own rows only (raw rows or their cube.Cube)
+def aggregate(raw):
+  cube = as_cube(raw).rollup(GRAIN)
+
+  # --- Weighted average age for each Vaccine status (unvaccinated/vaccinated/unknown) - Axis 0
+  # Unknown age slot is left out, Vaccine status without admissions on date is NaN
+  qty, age_sum, _ = cube.weighted_sums('status')
+  result = ratio(cube.frame(age_sum, VACCINATED), cube.frame(qty, VACCINATED))
+  result = result[['unvaccinated', 'vaccinated', 'unknown']]
+  result = result.dropna(subset=['unvaccinated']) # Dates with unvaccinated admissions
+
+  # --- Sum admissions Daily (including unknown age slot) - Axis 1
+  resultAD = cube.frame(cube.sum('status'), [status + '_adm' for status in VACCINATED])
+  resultAD = resultAD[['unvaccinated_adm', 'vaccinated_adm', 'unknown_adm']]
+
+  return {'result': result, 'resultAD': resultAD}
+
+# Moving averages of all columns (unvaccinated_ma7, ..., unknown_adm_ma7) - previous WINDOW rows, closed='left'
+def moving_average(frames):
+  result = frames['result']
+  result = pd.concat([result, moving_averages(result, WINDOW)], axis=1)
+
+  resultAD = frames['resultAD']
+  resultAD = pd.concat([resultAD, moving_averages(resultAD, WINDOW)], axis=1)
+
+  return {'result': result, 'resultAD': resultAD}
+
+def prepare(raw):
+  return moving_average(aggregate(raw))
+
+def layout():
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
   # --- Plot figure
   fig, axs = plt.subplots(2, 1, figsize=(10, 8))
-  plt.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.99, hspace=0.06)
+  fig.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.99, hspace=0.06)
 
   # Common axis settings:
   for ax in axs:
-    ax.set_prop_cycle(color=['#D9D9D9','#A4DBFD','#FFDFA4','#6b6b6b','#069af3','#ffa500'])
+    ax.set_prop_cycle(color=COLORS)
     # Grid, major and minor ticks settings
     ax.grid(visible=True, which='both')
     ax.minorticks_on()
@@ -108,49 +77,82 @@ if is_uri_ok(uri):
       label.set(rotation=0, horizontalalignment='center')
     # Set x axis range
     xlimoOffset = datetime.timedelta(days=7)
-    ax.set_xlim(datetime.datetime(2021, 8, 1) - xlimoOffset, datetime.datetime(2022, 5, 1) + xlimoOffset)
-  
+    ax.set_xlim(XLIM[0] - xlimoOffset, XLIM[1] + xlimoOffset)
+
   # 0. Axis - Daily weighten average age
   ax = axs[0]
-  ax.plot(result['unknown'], label='unknown')
-  ax.plot(result['vaccinated'], label='vaccinated')
-  ax.plot(result['unvaccinated'], label='unvaccinated')
-  ax.plot(result['unknown_ma7'], label='unknown_ma7')
-  ax.plot(result['vaccinated_ma7'], label='vaccinated_ma7')
-  ax.plot(result['unvaccinated_ma7'], label='unvaccinated_ma7')
-  ax.set_title('Slovakia Covid Hospital Admission Daily by Vaccine status - age_group Weighted Average & ma7', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
+  age = [ax.plot([], [], label=label)[0] for label in ['unknown', 'vaccinated', 'unvaccinated', 'unknown_' + ma, 'vaccinated_' + ma, 'unvaccinated_' + ma]]
+  ax.set_title('Slovakia Covid Hospital Admission ' + GRAIN_TITLES[GRAIN] + ' by Vaccine status - age_group Weighted Average & ' + ma, loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
   ax.set_xticklabels([])
   ax.yaxis.set_major_locator(mticker.MultipleLocator(10))
   ax.yaxis.set_minor_locator(mticker.MultipleLocator(2))
   ax.legend(loc='upper right')
   ax.set_xlabel(None)
   ax.set_ylabel("Age")
-  ax.set_ylim(40, 90)
+  ax.set_ylim(*YLIM[0])
 
   # 1. Axis - Daily admissions
   ax = axs[1]
-  ax.plot(resultAD['unknown_adm'], label='unknown_adm')
-  ax.plot(resultAD[['vaccinated_adm', 'unknown_adm']].sum(axis=1), label='vaccinated_adm')
-  ax.plot(resultAD[['unvaccinated_adm', 'unknown_adm', 'vaccinated_adm']].sum(axis=1), label='unvaccinated_adm')
-  ax.fill_between(x=resultAD['unknown_adm'].index, y1=resultAD['unknown_adm'].values)
-  ax.fill_between(x=resultAD['vaccinated_adm'].index, y1=resultAD[['vaccinated_adm', 'unknown_adm']].sum(axis=1), y2=resultAD['unknown_adm'].values)
-  ax.fill_between(x=resultAD['unvaccinated_adm'].index, y1=resultAD[['unvaccinated_adm', 'unknown_adm', 'vaccinated_adm']].sum(axis=1), y2=resultAD[['vaccinated_adm', 'unknown_adm']].sum(axis=1))
-  ax.plot(resultAD['unknown_adm_ma7'], label='unknown_ma7')
-  ax.plot(resultAD[['vaccinated_adm_ma7', 'unknown_adm_ma7']].sum(axis=1), label='vaccinated_ma7')
-  ax.plot(resultAD[['unvaccinated_adm_ma7', 'unknown_adm_ma7', 'vaccinated_adm_ma7']].sum(axis=1), label='unvaccinated_ma7')
-  ax.set_title('Slovakia Covid Hospital Admission Daily by Vaccine status', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
-  ax.yaxis.set_major_locator(mticker.MultipleLocator(100))
-  ax.yaxis.set_minor_locator(mticker.MultipleLocator(20))
+  adm = [ax.plot([], [], label=label)[0] for label in ['unknown_adm', 'vaccinated_adm', 'unvaccinated_adm']]
+  adm_fill = [ax.fill_between(x=[], y1=[]) for _ in range(3)]
+  adm_ma = [ax.plot([], [], label=label)[0] for label in ['unknown_' + ma, 'vaccinated_' + ma, 'unvaccinated_' + ma]]
+  ax.set_title('Slovakia Covid Hospital Admission ' + GRAIN_TITLES[GRAIN] + ' by Vaccine status', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
+  days = GRAIN_DAYS[GRAIN] # Admissions per period - range and ticks of daily admissions times days of period
+  ax.yaxis.set_major_locator(mticker.MultipleLocator(100*days))
+  ax.yaxis.set_minor_locator(mticker.MultipleLocator(20*days))
   ax.set_xlabel(None)
   ax.set_ylabel("Admissions", labelpad=0)
-  ax.set_ylim(0, 500)
+  ax.set_ylim(YLIM[1][0]*days, YLIM[1][1]*days)
 
   # Note inside plot
-  ax.annotate('Source: github.com/Institut-Zdravotnych-Analyz/covid19-data (' + str(release_date) + ')',
+  note = ax.annotate(source_note(''),
                 xy = (1.0, -0.12),
                 xycoords='axes fraction',
                 ha='right',
                 va="center",
                 fontsize=8)
 
-  plt.savefig('./res/Hospitalizations/Admissions_Age_WAverage_by_Vaccine_Daily.png')
\ No newline at end of file
+  return fig, {'age': age, 'adm': adm, 'adm_fill': adm_fill, 'adm_ma': adm_ma, 'note': note}
+
+def update(artists, frames, release_date):
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
+  result = frames['result']
+  resultAD = frames['resultAD']
+
+  # 0. Axis - weighted average age and moving average of unknown, vaccinated, unvaccinated
+  for artist, column in zip(artists['age'], ['unknown', 'vaccinated', 'unvaccinated', 'unknown_' + ma, 'vaccinated_' + ma, 'unvaccinated_' + ma]):
+    set_line(artist, result[column])
+
+  # 1. Axis - admissions stacked as unknown, + vaccinated, + unvaccinated
+  stacked = pd.DataFrame(index=resultAD.index)
+  stacked['unknown_adm'] = resultAD['unknown_adm']
+  stacked['vaccinated_adm'] = resultAD[['vaccinated_adm', 'unknown_adm']].sum(axis=1)
+  stacked['unvaccinated_adm'] = resultAD[['unvaccinated_adm', 'unknown_adm', 'vaccinated_adm']].sum(axis=1)
+  stacked['unknown_' + ma] = resultAD['unknown_adm_' + ma]
+  stacked['vaccinated_' + ma] = resultAD[['vaccinated_adm_' + ma, 'unknown_adm_' + ma]].sum(axis=1)
+  stacked['unvaccinated_' + ma] = resultAD[['unvaccinated_adm_' + ma, 'unknown_adm_' + ma, 'vaccinated_adm_' + ma]].sum(axis=1)
+
+  for artist, column in zip(artists['adm'], ['unknown_adm', 'vaccinated_adm', 'unvaccinated_adm']):
+    set_line(artist, stacked[column])
+  fill = artists['adm_fill']
+  fill[0] = set_fill(fill[0], resultAD.index, stacked['unknown_adm'].values)
+  fill[1] = set_fill(fill[1], resultAD.index, stacked['vaccinated_adm'].values, stacked['unknown_adm'].values)
+  fill[2] = set_fill(fill[2], resultAD.index, stacked['unvaccinated_adm'].values, stacked['vaccinated_adm'].values)
+  for artist, column in zip(artists['adm_ma'], ['unknown_' + ma, 'vaccinated_' + ma, 'unvaccinated_' + ma]):
+    set_line(artist, stacked[column])
+
+  artists['note'].set_text(source_note(release_date))
+
+TEMPLATE = Template(layout, update)
+
+def plot(frames, release_date):
+  return TEMPLATE.plot(frames, release_date)
+
+def render(frames, release_date, output=OUTPUT):
+  TEMPLATE.render(frames, release_date, output)
+
+if __name__ == '__main__':
+  data = load_charts(DATASET, [sys.modules[__name__]])
+  if data is not None:
+    raw, release_date, _ = data
+    render(prepare(raw), release_date)
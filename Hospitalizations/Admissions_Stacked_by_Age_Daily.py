@@ -1,59 +1,54 @@
+import sys
 import datetime
-import requests
-import array as arr
-import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.dates import MO
 import matplotlib.ticker as mticker
+from .data import load_charts
+from .cube import as_cube, bin_labels
+from .rolling import rolling
+from .manifest import date_window
+from .template import Template, set_stack, source_note, GRAIN_TITLES
 
-uri = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_AdmissionDischarge.csv'
-
-def is_uri_ok(uri_string, print_error=True):
-  try:
-    r = requests.head(uri_string)
-    r.raise_for_status()
-    return True
-  except requests.exceptions.RequestException as error:
-    if print_error:
-      print(error)
-    pass
-  return False
-
-if is_uri_ok(uri):
-  raw = pd.read_csv(uri, sep=';', index_col=0) # error_bad_lines=False
-  
-  release_date = raw['Date'].values[0]
-  
-  # --- Set Data range -> start from date
-  # row_no = raw.loc[raw['Date'] == '2021-08-01'].last_valid_index()
-  # raw = raw.drop(raw.index[row_no:])
-
-  # --- Convert date to datetime
-  raw['Date'] = raw['Date'].apply(pd.to_datetime)
-
-  # --- Cleansing raw
-  raw['Vaccinated'] = raw['Vaccinated'].fillna(value='unknown') # Replace NaN with word unknown
-  #raw['age_group'] = raw['age_group'].fillna(value=55) # Replace NaN with value 55 (average age of unvaccinated COVID-19 patient) - currently in use in Daily admissions axis only
-  raw['age_group'] = raw['age_group']+5 # Middle value of age_group (e.g. age_group 0 = 0-10 age --> will be 5)
-  raw = raw.loc[~(raw['Admissions'] == 0)] # Remove unnecessary zero admissions
-  raw = raw.dropna(subset=['age_group']) # Additional cleansing before weighten average --> Remove NaN for proper calculation
-
-  # --- Result - Axis 0
-  p = pd.pivot_table(raw, index=['Date'] , columns=['age_group'], values='Admissions', aggfunc=np.sum, fill_value=0)
-  p['total'] = p.sum(axis=1)
-
-  df = p.apply(lambda x: (x / x.total)*100, axis=1)
-  df = df.rolling(7, closed='left').mean()
-  df = df.drop('total', axis=1)
+DATASET = 'admissions'
+GRAIN = 'D' # Frames are indexed by date, or by first date of period of coarser grain ('W', 'M', 'Q')
+WINDOW = 7 # Moving average window (periods of GRAIN)
+AGE_BINS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100] # Stacked age bins by lower bound, e.g. [0, 20, 60] for 0-19, 20-59, 60+
+XLIM = (datetime.datetime(2021, 8, 1), datetime.datetime(2022, 5, 1)) # Visible date range
+YLIM = [(0, 100)] # Y axis range
+COLORS = ['#EFE0FF', '#DDBEFF', '#C6DFF3', '#7EAED7', '#4F7794', '#FEE2A1', '#FDD472', '#FCB714', '#F79A7E', '#F15628', '#B5411E']
+OUTPUT = './res/Hospitalizations/Admissions_Stacked_by_Age_Daily.png'
 
+# Dates read from data set (data.load_charts) - visible range with moving average warm-up
+def dates():
+  return date_window(XLIM, GRAIN, WINDOW)
+
+# Per period (GRAIN) values, each period is computed from its own rows only (raw rows or their cube.Cube)
+def aggregate(raw):
+  cube = as_cube(raw).rollup(GRAIN).rebin(AGE_BINS) # Every age bin, also without admissions
+  cube = cube.select(cube.sum(known_age=True) != 0) # Remove dates with zero admissions of known age only (unknown age slot is left out)
+
+  # --- Result - Axis 0 - share of every age bin [%]
+  df = cube.frame(cube.shares('age'), pd.Index(bin_labels(AGE_BINS), name='age_group'))
+
+  return {'df': df}
+
+# Moving average of all age_group columns - previous WINDOW rows, closed='left'
+def moving_average(frames):
+  return {'df': rolling(frames['df'], [WINDOW])[WINDOW]}
+
+def prepare(raw):
+  return moving_average(aggregate(raw))
+
+def layout():
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
   # --- Plot figure
   fig, ax = plt.subplots(figsize=(10, 8))
-  plt.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.96, hspace=0.06)
+  fig.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.96, hspace=0.06)
 
   # Common axis settings:
-  ax.set_prop_cycle(color=['#EFE0FF', '#DDBEFF', '#C6DFF3', '#7EAED7', '#4F7794', '#FEE2A1', '#FDD472', '#FCB714', '#F79A7E', '#F15628', '#B5411E'])
+  ax.set_prop_cycle(color=COLORS)
   # Grid, major and minor ticks settings
   ax.grid(visible=True, which='both')
   ax.minorticks_on()
@@ -68,28 +63,45 @@ if is_uri_ok(uri):
     label.set(rotation=0, horizontalalignment='center')
   # Set x axis range
   xlimoOffset = datetime.timedelta(days=7)
-  ax.set_xlim(datetime.datetime(2021, 8, 1) - xlimoOffset, datetime.datetime(2022, 5, 1) + xlimoOffset)
-  
-  # 0. Axis - Daily Admissions Stacked by age_group
-  colLabels = []
-  for column in df:
-    # Custom column labels
-    colLabels.append(str(round(column)-5)+'-'+str(round(column)+5))
-  ax.stackplot(df.index, df[5.0], df[15.0], df[25.0], df[35.0], df[45.0], df[55.0], df[65.0], df[75.0], df[85.0], df[95.0], df[105.0], labels=colLabels)
-  ax.set_title('Slovakia Covid Hospital Admission Daily ma7 - Stacked by age_group', loc='center', y=1.002, x=0.5, fontsize='large')
+  ax.set_xlim(XLIM[0] - xlimoOffset, XLIM[1] + xlimoOffset)
+
+  # 0. Axis - Daily Admissions Stacked by age_group - one area per age bin
+  colLabels = bin_labels(AGE_BINS)
+  stack = ax.stackplot([], *[[] for _ in colLabels], labels=colLabels)
+  ax.set_title('Slovakia Covid Hospital Admission ' + GRAIN_TITLES[GRAIN] + ' ' + ma + ' - Stacked by age_group', loc='center', y=1.002, x=0.5, fontsize='large')
   ax.yaxis.set_major_locator(mticker.MultipleLocator(10))
   ax.yaxis.set_minor_locator(mticker.MultipleLocator(2))
   ax.legend(loc='upper right')
   ax.set_xlabel(None)
   ax.set_ylabel("Age groups [%]")
-  ax.set_ylim(0, 100)
+  ax.set_ylim(*YLIM[0])
 
   # Note inside plot
-  ax.annotate('Source: github.com/Institut-Zdravotnych-Analyz/covid19-data (' + str(release_date) + ')',
+  note = ax.annotate(source_note(''),
                 xy = (1.0, -0.06),
                 xycoords='axes fraction',
                 ha='right',
                 va="center",
                 fontsize=8)
 
-  plt.savefig('./res/Hospitalizations/Admissions_Stacked_by_Age_Daily.png')
\ No newline at end of file
+  return fig, {'stack': stack, 'note': note}
+
+def update(artists, frames, release_date):
+  df = frames['df']
+
+  set_stack(artists['stack'], df.index, [df[column].values for column in df.columns])
+  artists['note'].set_text(source_note(release_date))
+
+TEMPLATE = Template(layout, update)
+
+def plot(frames, release_date):
+  return TEMPLATE.plot(frames, release_date)
+
+def render(frames, release_date, output=OUTPUT):
+  TEMPLATE.render(frames, release_date, output)
+
+if __name__ == '__main__':
+  data = load_charts(DATASET, [sys.modules[__name__]])
+  if data is not None:
+    raw, release_date, _ = data
+    render(prepare(raw), release_date)
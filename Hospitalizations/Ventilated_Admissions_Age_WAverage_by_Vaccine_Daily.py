@@ -1,73 +1,59 @@
+import sys
 import datetime
-import requests
-import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.ticker as mticker
-
-def is_uri_ok(uri_string, print_error=True):
-  try:
-    r = requests.head(uri_string)
-    r.raise_for_status()
-    return True
-  except requests.exceptions.RequestException as error:
-    if print_error:
-      print(error)
-    pass
-  return False
-
-uri = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_UPV_AdmissionDischarge.csv'
-
-if is_uri_ok(uri):
-  raw = pd.read_csv(uri, sep=';', index_col=0)
-
-  release_date = raw['Date'].values[0]
-
-  # --- Set Data range -> start from date
-  # row_no = raw.loc[raw['Date'] == '2021-08-01'].first_valid_index()
-  # raw = raw.drop(raw.index[:row_no-1])
-
-  # --- Convert date to datetime
-  raw['Date'] = raw['Date'].apply(pd.to_datetime)
-
-  # --- Create pivot table
-  p = pd.pivot_table(raw, index=['Date', 'age_group'] , columns=['Vaccinated'], values='Admissions', aggfunc=np.sum, fill_value=0)
-  p = p.rename(columns={False:'unvax', True:'vax'})
-
-  # --- Split Data into categories
-
-  # Remove rows with zero
-  # When using the average function, if weights are given, they can not add up to 0 because that leads to division by 0
-  wa_unvax = p.loc[~(p['unvax'] == 0)]
-  # Applay reset_index to avoid MultiIndex
-  wa_unvax = wa_unvax.reset_index(1)
-
-  wa_vax = p.loc[~(p['vax'] == 0)]
-  wa_vax = wa_vax.reset_index(1)
+from .data import load_charts, VACCINATED
+from .stats import ratio
+from .cube import as_cube
+from .rolling import moving_averages
+from .manifest import date_window
+from .template import Template, set_line, source_note
+
+DATASET = 'upv'
+GRAIN = 'D' # Frames are indexed by date, or by first date of period of coarser grain ('W', 'M', 'Q')
+WINDOW = 7 # Moving average window (periods of GRAIN)
+XLIM = (datetime.datetime(2021, 8, 1), datetime.datetime(2022, 5, 1)) # Visible date range
+YLIM = [(0, 100)] # Y axis range
+COLORS = ['#FFDFA4', '#A4DBFD', '#ffa500', '#069af3']
+OUTPUT = './res/Hospitalizations/Ventilated_Admissions_Age_WAverage_by_Vaccine_Daily.png'
+
+# Dates read from data set (data.load_charts) - visible range with moving average warm-up
+def dates():
+  return date_window(XLIM, GRAIN, WINDOW)
+
+# Per period (GRAIN) values, each period is computed from its own rows only (raw rows or their cube.Cube)
+def aggregate(raw):
+  cube = as_cube(raw).rollup(GRAIN)
 
   # --- Calculate Average by weights for each category
-  # https://stackoverflow.com/questions/31521027/groupby-weighted-average-and-sum-in-pandas-dataframe
-  wa_unvax = wa_unvax.groupby(wa_unvax.index).apply(lambda x: np.average(x.age_group.astype(np.int8), weights=x.unvax))
-  wa_unvax = wa_unvax.rename('unvaccinated') # Renamed for proper graph legend
-  wa_unvax = wa_unvax.to_frame()
+  # Unknown age slot is left out, category without admissions on date is NaN
+  qty, age_sum, _ = cube.weighted_sums('status')
+  result = ratio(cube.frame(age_sum, VACCINATED), cube.frame(qty, VACCINATED))
+  result = result[['unvaccinated', 'vaccinated']]
+  result = result.dropna(subset=['unvaccinated']) # Dates with unvaccinated admissions
 
-  wa_vax = wa_vax.groupby(wa_vax.index).apply(lambda x: np.average(x.age_group.astype(np.int8), weights=x.vax))
-  wa_vax = wa_vax.rename('vaccinated')
-  wa_vax = wa_vax.to_frame()
+  return {'result': result}
 
-  # --- Result Data as new DataFrame
-  result = pd.DataFrame.join(wa_unvax, wa_vax, on='Date')
-  # print(result)
-  # print(type(result))
+def moving_average(frames):
+  # --- Add moving average (unvaccinated_ma7, vaccinated_ma7) - previous WINDOW rows, closed='left'
+  result = frames['result']
+  result = pd.concat([result, moving_averages(result, WINDOW)], axis=1)
+  return {'result': result}
 
-  # --- Add moving average
-  result['unvaccinated_ma7'] = result['unvaccinated'].rolling(7, closed='left').mean()
-  result['vaccinated_ma7'] = result['vaccinated'].rolling(7, closed='left').mean()
+def prepare(raw):
+  return moving_average(aggregate(raw))
 
+def layout():
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
   # --- Plot Data
-  ax = result.plot.line(title='Slovakia Covid Hospital Ventilated Admissions - age_group Weighted Average & ma7', figsize=(10,8), color = ['#FFDFA4', '#A4DBFD', '#ffa500', '#069af3'])
-  plt.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.96)
+  fig, ax = plt.subplots(figsize=(10, 8))
+  fig.subplots_adjust(left=0.06, right=0.99, bottom= 0.065, top=0.96)
+  ax.set_prop_cycle(color=COLORS)
+  lines = [ax.plot([], [], label=label)[0] for label in ['unvaccinated', 'vaccinated', 'unvaccinated_' + ma, 'vaccinated_' + ma]]
+  ax.set_title('Slovakia Covid Hospital Ventilated Admissions - age_group Weighted Average & ' + ma)
+  ax.legend()
 
   ax.grid(visible=True, which='both')
   ax.minorticks_on()
@@ -75,6 +61,10 @@ if is_uri_ok(uri):
   ax.grid(which='major', color='#a9a9a9', linewidth=1)
   ax.grid(which='minor', color='#e0e0e0', linewidth=0.6)
   ax.tick_params(which='minor', color='#e0e0e0')
+  # Set x and y axis range
+  xlimoOffset = datetime.timedelta(days=7)
+  ax.set_xlim(XLIM[0] - xlimoOffset, XLIM[1] + xlimoOffset)
+  ax.set_ylim(*YLIM[0])
   ax.xaxis.set_major_locator(mdates.MonthLocator(interval=1))
   ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
   ax.xaxis.set_minor_locator(mdates.WeekdayLocator())
@@ -85,17 +75,35 @@ if is_uri_ok(uri):
     label.set(rotation=0, horizontalalignment='center')
   ax.set_xlabel(None)
   ax.set_ylabel("Age")
-  # Set x and y axis range
-  xlimoOffset = datetime.timedelta(days=7)
-  ax.set_xlim(datetime.datetime(2021, 8, 1) - xlimoOffset, datetime.datetime(2022, 5, 1) + xlimoOffset)
-  ax.set_ylim(0, 100)
 
   # Note inside plot area - foot note
-  ax.annotate('Source: github.com/Institut-Zdravotnych-Analyz/covid19-data (' + str(release_date) + ')',
+  note = ax.annotate(source_note(''),
                 xy = (1.0, -0.06),
                 xycoords='axes fraction',
                 ha='right',
                 va='center',
                 fontsize=8)
 
-  plt.savefig('./res/Hospitalizations/Ventilated_Admissions_Age_WAverage_by_Vaccine_Daily.png')
\ No newline at end of file
+  return fig, {'lines': lines, 'note': note}
+
+def update(artists, frames, release_date):
+  ma = 'ma%d' % WINDOW # Moving average label, e.g. ma7
+  result = frames['result']
+
+  for artist, column in zip(artists['lines'], ['unvaccinated', 'vaccinated', 'unvaccinated_' + ma, 'vaccinated_' + ma]):
+    set_line(artist, result[column])
+  artists['note'].set_text(source_note(release_date))
+
+TEMPLATE = Template(layout, update)
+
+def plot(frames, release_date):
+  return TEMPLATE.plot(frames, release_date)
+
+def render(frames, release_date, output=OUTPUT):
+  TEMPLATE.render(frames, release_date, output)
+
+if __name__ == '__main__':
+  data = load_charts(DATASET, [sys.modules[__name__]])
+  if data is not None:
+    raw, release_date, _ = data
+    render(prepare(raw), release_date)
@@ -1,79 +1,61 @@
+import sys
 import datetime
-import requests
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.ticker as mticker
-
-def is_uri_ok(uri_string, print_error=True):
-  try:
-    r = requests.head(uri_string)
-    r.raise_for_status()
-    return True
-  except requests.exceptions.RequestException as error:
-    if print_error:
-      print(error)
-    pass
-  return False
-
-uri = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_UPV_AdmissionDischarge.csv'
-
-if is_uri_ok(uri):
-  raw = pd.read_csv(uri, sep=';', index_col=0)
-
-  release_date = raw['Date'].values[0]
-
-  # --- Set Data range -> start from date
-  row_no = raw.loc[raw['Date'] == '2021-08-01'].last_valid_index()
-  raw = raw.drop(raw.index[row_no:])
-
-  # --- Convert date to month no.
-  raw['Date'] = raw['Date'].apply(pd.to_datetime)
-  raw['Date'] = raw['Date'].values.astype('datetime64[M]') # OUT: YYYY-mm-dd, result is first date in month
-  # raw['Date'] = raw['Date'].to_period('M') # >>> OUT: YYYY-mm, result is not of the datetime64
-  # month_grp = pd.Grouper(key='Date',freq='M') # >>> OUT: YYYY-mm-dd, result is last date in month 
-
-  # --- Create pivot table
-  p = pd.pivot_table(raw, index=['Date', 'age_group'] , columns=['Vaccinated'], values='Admissions', aggfunc=np.sum, fill_value=0)
-  p = p.rename(columns={False:'unvaccinated', True:'vaccinated'})
-
-  # --- Split Data into categories
-
-  # Remove rows with zero
-  # When using the average function, if weights are given, they can not add up to 0 because that leads to division by 0
-  wa_unvax = p.loc[~(p['unvaccinated'] == 0)]
-  # Applay reset_index to avoid MultiIndex
-  wa_unvax = wa_unvax.reset_index(1)
-
-  wa_vax = p.loc[~(p['vaccinated'] == 0)]
-  wa_vax = wa_vax.reset_index(1)
+from .data import load_charts, VACCINATED
+from .stats import ratio
+from .cube import as_cube
+from .manifest import date_window
+from .template import Template, set_line, set_bars, set_labels, source_note, BAR_WIDTHS
+
+DATASET = 'upv'
+GRAIN = 'M' # Frames are indexed by first date in month (of period of other grain 'D', 'W', 'Q')
+WINDOW = 0
+XLIM = (datetime.datetime(2021, 8, 1), datetime.datetime(2022, 5, 1)) # Visible date range
+YLIM = [(35, 85), (0, 900)] # Y axis range of axis 0, 1
+COLORS = ['#ffa500', '#069af3']
+OUTPUT = './res/Hospitalizations/Ventilated_Admissions_Age_WAverage_by_Vaccine_Monthly.png'
+
+# Dates read from data set (data.load_charts) - visible range with moving average warm-up
+def dates():
+  return date_window(XLIM, GRAIN, WINDOW)
+
+# Per month (GRAIN) values, each month is computed from its own rows only (raw rows or their cube.Cube)
+def aggregate(raw):
+  # --- Set Data range -> months as first date in month, start from month of date
+  cube = as_cube(raw).rollup(GRAIN).between(XLIM[0])
+
+  # --- Sum of admissions and of admissions weighted by age for each category (unknown age slot is left out)
+  qty, age_sum, _ = cube.weighted_sums('status')
+  qty = cube.frame(qty, VACCINATED)
 
   # --- Calculate Average by weights for each category
-  # https://stackoverflow.com/questions/31521027/groupby-weighted-average-and-sum-in-pandas-dataframe
-  wa_unvax = wa_unvax.groupby(wa_unvax.index).apply(lambda x: np.average(x.age_group.astype(np.int8), weights=x.unvaccinated))
-  wa_unvax = wa_unvax.rename('unvaccinated') # Renamed for proper graph legend
+  result = ratio(cube.frame(age_sum, VACCINATED), qty)[['unvaccinated', 'vaccinated']]
+  result = result.dropna(subset=['unvaccinated']) # Months with unvaccinated admissions
+  result['unvaccinated_qty'] = qty['unvaccinated']
+  result['vaccinated_qty'] = qty['vaccinated']
 
-  wa_vax = wa_vax.groupby(wa_vax.index).apply(lambda x: np.average(x.age_group.astype(np.int8), weights=x.vaccinated))
-  wa_vax = wa_vax.rename('vaccinated')
+  return {'result': result}
 
-  # --- Result Data as new DataFrame
-  result = pd.DataFrame.join(wa_unvax.to_frame(), wa_vax.to_frame(), on='Date')
-  result['unvaccinated_qty'] = p['unvaccinated'].groupby(level=['Date']).sum()
-  result['vaccinated_qty'] = p['vaccinated'].groupby(level=['Date']).sum()
-  # print(result.head())
-  # print(type(result))
+# No moving average on monthly values
+def moving_average(frames):
+  return frames
 
+def prepare(raw):
+  return moving_average(aggregate(raw))
+
+def layout():
   # --- Plot
-  # plt.figure("SVK C19 Hospital Ventilated Admissions")
   fig, axs = plt.subplots(2, 1, figsize=(10, 8), constrained_layout=True)
 
   # Custom plot layout (set constrained_layout=False)
-  # plt.subplots_adjust(left=0.07, right=0.99, bottom= 0.07, top=0.99)
+  # fig.subplots_adjust(left=0.07, right=0.99, bottom= 0.07, top=0.99)
 
   # Common axis settings:
   for ax in axs:
-      ax.set_prop_cycle(color=['#ffa500', '#069af3'])
+      ax.set_prop_cycle(color=COLORS)
       # Grid, major and minor ticks settings
       ax.grid(visible=True, which='both')
       ax.minorticks_on()
@@ -86,33 +68,22 @@ if is_uri_ok(uri):
       ax.set_xlabel(None)
       # Set x axis range
       xlimoOffset = datetime.timedelta(days=7)
-      ax.set_xlim(datetime.datetime(2021, 8, 1) - xlimoOffset, datetime.datetime(2022, 5, 1) + xlimoOffset)
-      
+      ax.set_xlim(XLIM[0] - xlimoOffset, XLIM[1] + xlimoOffset)
+
   # 0. Axis - Slovakia Covid Hospital Ventilated Admissions - age_group Weighted Average
   ax = axs[0]
-  ax.plot(result['unvaccinated'], label='unvaccinated', marker='o')
-  ax.plot(result['vaccinated'], label='vaccinated', marker='o')
+  lines = [ax.plot([], [], label=label, marker='o')[0] for label in ['unvaccinated', 'vaccinated']]
   ax.set_title('Slovakia Covid Hospital Ventilated Admissions - age_group Weighted Average', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
   ax.set_xticklabels([])
   ax.yaxis.set_major_locator(mticker.MultipleLocator(10))
   ax.yaxis.set_minor_locator(mticker.MultipleLocator(2.5))
   ax.legend()
   ax.set_ylabel('Age')
-  ax.set_ylim(35, 85)
-  # Create marker labels
-  yAnnotateOffset = 0.03
-  for idx, row in result.iterrows():
-    if row['unvaccinated'] < row['vaccinated']:
-      ax.annotate(row['unvaccinated'].round(2), xy=(idx, row['unvaccinated']*(1-yAnnotateOffset)), fontsize=8, ha='center', va='top')
-      ax.annotate(row['vaccinated'].round(2), xy=(idx, row['vaccinated']*(1+yAnnotateOffset)), fontsize=8, ha='center', va='center')
-    else:
-      ax.annotate(row['unvaccinated'].round(2), xy=(idx, row['unvaccinated']*(1+yAnnotateOffset)), fontsize=8, ha='center', va='center')
-      ax.annotate(row['vaccinated'].round(2), xy=(idx, row['vaccinated']*(1-yAnnotateOffset)), fontsize=8, ha='center', va='top')
+  ax.set_ylim(*YLIM[0])
 
   # 1. Axis - Slovakia Covid Hospital Ventilated Admissions
   ax = axs[1]
-  ax.bar(result.index, result['unvaccinated_qty'].values, bottom=result['vaccinated_qty'].values, width=10)
-  ax.bar(result.index, result['vaccinated_qty'].values, width=10)
+  bars = [ax.bar([], [], width=BAR_WIDTHS[GRAIN]) for _ in range(2)]
   ax.set_title('Slovakia Covid Hospital Ventilated Admissions', loc='left', y=0.9, x=0.02, fontsize='medium', backgroundcolor='white')
   ax.yaxis.set_major_locator(mticker.MultipleLocator(100))
   ax.yaxis.set_minor_locator(mticker.MultipleLocator(50))
@@ -120,14 +91,54 @@ if is_uri_ok(uri):
   for label in ax.get_xticklabels(which='major'):
     label.set(rotation=0, horizontalalignment='center')
   ax.set_ylabel('Admissions')
-  ax.set_ylim(0, 900)
+  ax.set_ylim(*YLIM[1])
 
   # Note inside plot area - foot note
-  ax.annotate('Source: github.com/Institut-Zdravotnych-Analyz/covid19-data (' + str(release_date) + ')',
+  note = ax.annotate(source_note(''),
                 xy = (1.0, -0.12),
                 xycoords='axes fraction',
                 ha='right',
                 va='center',
                 fontsize=8)
 
-  plt.savefig('./res/Hospitalizations/Ventilated_Admissions_Age_WAverage_by_Vaccine_Monthly.png')
\ No newline at end of file
+  return fig, {'axs': axs, 'lines': lines, 'labels': [], 'bars': bars, 'note': note}
+
+def update(artists, frames, release_date):
+  result = frames['result']
+  axs = artists['axs']
+
+  # 0. Axis - weighted average age with marker labels
+  set_line(artists['lines'][0], result['unvaccinated'])
+  set_line(artists['lines'][1], result['vaccinated'])
+  # Marker labels - lower value below its marker, higher value above its marker
+  yAnnotateOffset = 0.03
+  unvaccinated = result['unvaccinated'].to_numpy()
+  vaccinated = result['vaccinated'].to_numpy()
+  below = unvaccinated < vaccinated
+  xs = np.repeat(result.index.to_numpy(), 2)
+  ys = np.column_stack([unvaccinated*np.where(below, 1-yAnnotateOffset, 1+yAnnotateOffset),
+                        vaccinated*np.where(below, 1+yAnnotateOffset, 1-yAnnotateOffset)]).ravel()
+  vas = np.column_stack([np.where(below, 'top', 'center'), np.where(below, 'center', 'top')]).ravel()
+  texts = np.column_stack([result['unvaccinated'].round(2).astype(str), result['vaccinated'].round(2).astype(str)]).ravel()
+  set_labels(axs[0], artists['labels'], xs, ys, texts, vas, fontsize=8, ha='center')
+
+  # 1. Axis - admissions, unvaccinated stacked on vaccinated
+  bars = artists['bars']
+  bars[0] = set_bars(axs[1], bars[0], result.index, result['unvaccinated_qty'].values, COLORS[0], bottom=result['vaccinated_qty'].values, width=BAR_WIDTHS[GRAIN])
+  bars[1] = set_bars(axs[1], bars[1], result.index, result['vaccinated_qty'].values, COLORS[1], width=BAR_WIDTHS[GRAIN])
+
+  artists['note'].set_text(source_note(release_date))
+
+TEMPLATE = Template(layout, update)
+
+def plot(frames, release_date):
+  return TEMPLATE.plot(frames, release_date)
+
+def render(frames, release_date, output=OUTPUT):
+  TEMPLATE.render(frames, release_date, output)
+
+if __name__ == '__main__':
+  data = load_charts(DATASET, [sys.modules[__name__]])
+  if data is not None:
+    raw, release_date, _ = data
+    render(prepare(raw), release_date)
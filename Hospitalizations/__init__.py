@@ -0,0 +1,8 @@
+# --- Charts in order of daily figures update
+CHARTS = [
+  'Ventilated_Admissions_Age_WAverage_by_Vaccine_Daily',
+  'Ventilated_Admissions_Age_WAverage_by_Vaccine_Monthly',
+  'Admissions_Age_WAverage_by_Vaccine_Daily',
+  'Admissions_Age_WAverage_Basic_Daily',
+  'Admissions_Stacked_by_Age_Daily',
+]
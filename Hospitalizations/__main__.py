@@ -0,0 +1,180 @@
+import os
+import sys
+import argparse
+from . import CHARTS
+
+# Non-interactive backend, figures are only saved to files - set before any module imports pyplot (also
+# inherited by worker processes), matplotlib is not imported here
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# Synthetic source file options, defaults are in synthetic.py (not imported before a command needs it)
+def add_generator_arguments(parser):
+  parser.add_argument('--scale', type=int, default=1, help='multiplier of rows per key, 1 .. 1000 (default 1)')
+  parser.add_argument('--days', type=int, help='number of dates (default 502)')
+  parser.add_argument('--age-groups', type=int, help='number of 10 years age groups (default 11)')
+  parser.add_argument('--rows-per-key', type=int, help='rows per date, age group and vaccination status (default 20)')
+
+def generator_options(args):
+  options = {'scale': args.scale, 'days': args.days, 'age_groups': args.age_groups, 'rows_per_key': args.rows_per_key}
+  return {name: value for name, value in options.items() if value is not None}
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m Hospitalizations', description='Slovakia Covid hospitalizations graphs')
+  parser.add_argument('--profile-startup', action='store_true', help='report import time breakdown of no-op and render runs and exit')
+  commands = parser.add_subparsers(dest='command')
+
+  render_all = commands.add_parser('render-all', help='load every data set once and render all charts')
+  render_all.add_argument('--chart', action='append', choices=CHARTS, help='render only this chart (repeatable)')
+  render_all.add_argument('--incremental', action='store_true', help='recompute only newly published or revised dates')
+  render_all.add_argument('--full', action='store_true', help='with --incremental: rebuild stored state from all dates')
+  render_all.add_argument('--streaming', action='store_true', help='aggregate source files chunk by chunk with bounded memory')
+  render_all.add_argument('--force', action='store_true', help='render charts also when their manifest fingerprint is unchanged')
+  render_all.add_argument('--dry-run', action='store_true', help='only report which charts would be rendered')
+  render_all.add_argument('--export', action='store_true', help='write chart frames as CSV and memory-mappable columns into res/Hospitalizations/export')
+  render_all.add_argument('--trace', metavar='FILE', help='write per stage timing and memory as JSON lines (- for stderr) and print summary')
+  render_all.add_argument('--trace-no-memory', action='store_true', help='with --trace: record times only, without memory tracing overhead')
+  render_all.add_argument('--verify', action='store_true', help='with --incremental: compare with full recompute, exit 1 on difference')
+  render_all.add_argument('--grain', choices=['D', 'W', 'M', 'Q'], help='render chart variants with values per day, ISO week, month or quarter (e.g. <chart>_W.png)')
+  render_all.add_argument('--jobs', type=int, help='number of rendering processes (default number of CPUs)')
+  render_all.add_argument('--archive', action='store_true', help='store rendered figures also in figure archive under their release date')
+
+  render_as_of = commands.add_parser('render-as-of', help='render charts as of past dates into the figure archive')
+  render_as_of.add_argument('--date', action='append', default=[], help='cutoff date YYYY-MM-DD (repeatable)')
+  render_as_of.add_argument('--from', dest='start', help='first cutoff date of range YYYY-MM-DD')
+  render_as_of.add_argument('--to', dest='end', help='last cutoff date of range YYYY-MM-DD (default today)')
+  render_as_of.add_argument('--freq', default='D', help="cutoff dates frequency of range, 'D' every day, 'B' business days (default D)")
+  render_as_of.add_argument('--chart', action='append', choices=CHARTS, help='render only this chart (repeatable)')
+  render_as_of.add_argument('--jobs', type=int, help='number of rendering processes (default number of CPUs)')
+  render_as_of.add_argument('--archive-dir', help='figure archive directory (default res/Hospitalizations/archive, IZA_ARCHIVE_DIR)')
+  render_as_of.add_argument('--force', action='store_true', help='render also figures already in archive')
+  render_as_of.add_argument('--streaming', action='store_true', help='aggregate source files chunk by chunk with bounded memory')
+
+  archive = commands.add_parser('archive', help='content-addressed figure archive - list, changes, get, migrate dated files, prune')
+  archive.add_argument('action', choices=['list', 'changes', 'get', 'migrate', 'prune'], help='list charts (or figures of --chart), release dates on which --chart changed, '
+    + 'copy figure of --chart and --date to --output, copy dated files <date>_<chart>.png into the store, remove unreferenced blobs')
+  archive.add_argument('--chart', help='chart figure name, e.g. Admissions_Stacked_by_Age_Daily')
+  archive.add_argument('--date', help='release date YYYY-MM-DD')
+  archive.add_argument('--output', help='with get: output file (default <date>_<chart>.png)')
+  archive.add_argument('--delete', action='store_true', help='with migrate: remove dated files once stored (blobs are quantised, see IZA_ARCHIVE_COLORS)')
+  archive.add_argument('--archive-dir', help='figure archive directory (default res/Hospitalizations/archive, IZA_ARCHIVE_DIR)')
+
+  benchmark_render = commands.add_parser('benchmark-render', help='per render cost with and without figure templates')
+  benchmark_render.add_argument('--chart', action='append', choices=CHARTS, help='benchmark only this chart (repeatable)')
+  benchmark_render.add_argument('--repeat', type=int, default=10, help='renders of every chart (default 10)')
+
+  generate = commands.add_parser('generate', help='write synthetic source file with IZA hospital file schema')
+  generate.add_argument('output', help='output CSV file')
+  generate.add_argument('--dataset', default='admissions', choices=['admissions', 'upv'], help='admissions rate of data set (default admissions)')
+  add_generator_arguments(generate)
+
+  benchmark = commands.add_parser('benchmark', help='offline benchmark of all stages on synthetic source files')
+  benchmark.add_argument('--chart', action='append', choices=CHARTS, help='benchmark only this chart (repeatable)')
+  add_generator_arguments(benchmark)
+  benchmark.add_argument('--no-save', action='store_true', help='do not save results into .cache/benchmarks (IZA_BENCHMARK_DIR)')
+  benchmark.add_argument('--compare', metavar='RESULT', help='compare with saved result JSON file')
+  benchmark.add_argument('--no-memory', action='store_true', help='record times only, without memory tracing overhead')
+
+  serve = commands.add_parser('serve', help='local HTTP service rendering charts on request (date range, window, age bins, format)')
+  serve.add_argument('--host', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+  serve.add_argument('--port', type=int, help='port to listen on (default 8050, IZA_SERVICE_PORT)')
+  serve.add_argument('--workers', type=int, help='number of rendering processes (default number of CPUs)')
+  serve.add_argument('--cache-size', type=int, default=64, help='rendered images kept in memory (default 64)')
+  serve.add_argument('--streaming', action='store_true', help='aggregate source files chunk by chunk with bounded memory')
+
+  args = parser.parse_args(argv)
+
+  if args.profile_startup:
+    from .startup import profile
+    profile()
+    return 0
+  if args.command is None:
+    parser.error('a command is required')
+
+  if args.command == 'render-all':
+    # Standard library only check - pandas and matplotlib are not imported when nothing changed
+    from .precheck import nothing_to_do
+    from .archive import ARCHIVE_DIR
+    archive_dir = ARCHIVE_DIR if args.archive else None
+    if not (args.force or args.full or args.verify) and nothing_to_do(args.chart or CHARTS, export_frames=args.export, grain=args.grain, archive_dir=archive_dir):
+      print('Nothing to do - source files, code and figures are unchanged')
+      return 0
+    from .batch import render_all
+    from . import instrument
+    if args.trace:
+      instrument.enable(args.trace, trace_memory=not args.trace_no_memory)
+    differences = render_all(args.chart or CHARTS, incremental=args.incremental, full=args.full, verify=args.verify, streaming=args.streaming,
+      force=args.force, dry_run=args.dry_run, export_frames=args.export, grain=args.grain, jobs=args.jobs, archive_dir=archive_dir)
+    if instrument.enabled():
+      instrument.summary()
+    for difference in differences:
+      print(difference)
+    if differences:
+      return 1
+  elif args.command == 'render-as-of':
+    from .asof import cutoffs, render_as_of
+    from .archive import ARCHIVE_DIR
+    days = cutoffs(args.date, args.start, args.end, args.freq)
+    if not len(days):
+      parser.error('render-as-of: no cutoff date, use --date or --from')
+    render_as_of(days, args.chart or CHARTS, archive_dir=args.archive_dir or ARCHIVE_DIR, jobs=args.jobs, force=args.force, streaming=args.streaming)
+  elif args.command == 'archive':
+    return archive_command(parser, args)
+  elif args.command == 'benchmark-render':
+    from .benchmark import render_cost, print_render_cost
+    print_render_cost(render_cost(args.chart or CHARTS, repeat=args.repeat))
+  elif args.command == 'generate':
+    from .synthetic import generate
+    generate(args.output, args.dataset, **generator_options(args))
+  elif args.command == 'benchmark':
+    from .benchmark import suite, save, read, print_suite, print_compare
+    result = suite(args.chart or CHARTS, trace_memory=not args.no_memory, **generator_options(args))
+    print_suite(result)
+    if not args.no_save:
+      print('Saved ' + save(result))
+    if args.compare:
+      print_compare(read(args.compare), result)
+  elif args.command == 'serve':
+    from .service import serve, PORT
+    serve(args.host, args.port or PORT, workers=args.workers, cache_size=args.cache_size, streaming=args.streaming)
+  return 0
+
+def archive_command(parser, args):
+  from . import archive
+  archive_dir = args.archive_dir or archive.ARCHIVE_DIR
+  if args.action in ('changes', 'get') and not args.chart:
+    parser.error('archive %s: --chart is required' % args.action)
+
+  if args.action == 'migrate':
+    files, size, added = archive.migrate(archive_dir, delete=args.delete)
+    print('Migrated %d files (%d bytes) into %d bytes of new blobs%s' % (files, size, added, ', files removed' if args.delete else ''))
+  elif args.action == 'prune':
+    print('Removed %d unreferenced blobs' % archive.prune(archive_dir))
+  elif args.action == 'list' and not args.chart:
+    index = archive.read_index(archive_dir)
+    for chart in sorted(index['figures']):
+      dates = archive.history(index, chart)
+      print('%s: %d figures, %d changes, %s .. %s' % (chart, len(dates), len(archive.changes(index, chart)), dates[0][0], dates[-1][0]))
+    print('%(charts)d charts, %(figures)d figures, %(blobs)d blobs, %(bytes)d bytes' % archive.summary(index))
+  elif args.action in ('list', 'changes'):
+    index = archive.read_index(archive_dir)
+    dates = archive.history(index, args.chart) if args.action == 'list' else archive.changes(index, args.chart)
+    if not dates:
+      print('Chart %s is not in archive' % args.chart)
+      return 1
+    for release_date, digest in dates:
+      print('%s %s' % (release_date, digest[:12]))
+  elif args.action == 'get':
+    import shutil
+    if not args.date:
+      parser.error('archive get: --date is required')
+    path = archive.figure(archive.read_index(archive_dir), args.chart, args.date, archive_dir)
+    if path is None:
+      print('No figure of %s on %s in archive' % (args.chart, args.date))
+      return 1
+    output = args.output or '%s_%s.png' % (args.date, args.chart)
+    shutil.copyfile(path, output)
+    print('Written ' + output)
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,152 @@
+import io
+import os
+import re
+import json
+import hashlib
+
+# --- Content-addressed figure archive
+# Archive figures are stored once per distinct content:
+#   blobs/<ab>/<sha256>.png   figure named by sha256 of its (optimised) PNG bytes
+#   index.json                chart -> release date -> sha256 of its figure, size of every blob
+# A figure unchanged since the previous release adds one index entry and no bytes. Listing, history of
+# a chart and the figure of (chart, release date) are one read of the index, no directory scan.
+# PNG is optimised on write (Pillow, installed with matplotlib) - reduced to a palette of COLORS colors
+# (flat chart colors, only anti-aliased edges are merged) and saved with maximum zlib compression.
+# IZA_ARCHIVE_COLORS=0 keeps full color (lossless).
+# Dated archive files of earlier versions (<YYYY-MM-DD>_<chart>.png) are copied into the store by migrate().
+# Only the process owning the index writes it, blobs may be written by any process (render workers).
+ARCHIVE_DIR = os.environ.get('IZA_ARCHIVE_DIR', './res/Hospitalizations/archive')
+COLORS = int(os.environ.get('IZA_ARCHIVE_COLORS', 256))
+INDEX = 'index.json'
+INDEX_VERSION = 1
+DATED = re.compile(r'^(\d{4}-\d{2}-\d{2})_(.+)\.png$')
+FAST_OCTREE = 2 # PIL.Image quantize method, fast and smallest files for charts
+
+def optimize(png, colors=COLORS):
+  from PIL import Image
+  image = Image.open(io.BytesIO(png))
+  if image.mode == 'RGBA' and image.getextrema()[3][0] == 255:
+    image = image.convert('RGB') # Opaque figure, alpha channel is dropped
+  if colors:
+    image = image.quantize(colors, method=FAST_OCTREE, dither=0)
+  output = io.BytesIO()
+  image.save(output, format='PNG', optimize=True)
+  return output.getvalue()
+
+def blob_path(digest, archive_dir=ARCHIVE_DIR):
+  return os.path.join(archive_dir, 'blobs', digest[:2], digest + '.png')
+
+# Stores PNG bytes as blob (once), returns (sha256, size) of stored blob
+def put_blob(png, archive_dir=ARCHIVE_DIR, colors=COLORS):
+  data = optimize(png, colors)
+  digest = hashlib.sha256(data).hexdigest()
+  path = blob_path(digest, archive_dir)
+  if not os.path.exists(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+      f.write(data)
+    os.replace(tmp_path, path)
+  return digest, len(data)
+
+# Stores rendered figure file as blob (render worker side), returns (sha256, size)
+def store_file(path, archive_dir=ARCHIVE_DIR, colors=COLORS, remove=True):
+  with open(path, 'rb') as f:
+    stored = put_blob(f.read(), archive_dir, colors)
+  if remove:
+    os.remove(path)
+  return stored
+
+# --- Index
+def read_index(archive_dir=ARCHIVE_DIR):
+  try:
+    with open(os.path.join(archive_dir, INDEX), 'r', encoding='utf-8') as f:
+      index = json.load(f)
+  except (OSError, ValueError):
+    index = None
+  if index is None or index.get('version') != INDEX_VERSION:
+    index = {'version': INDEX_VERSION, 'figures': {}, 'blobs': {}}
+  return index
+
+def write_index(index, archive_dir=ARCHIVE_DIR):
+  os.makedirs(archive_dir, exist_ok=True)
+  path = os.path.join(archive_dir, INDEX)
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'w', encoding='utf-8') as f:
+    json.dump(index, f, indent=1, sort_keys=True) # One line per figure
+    f.write('\n')
+  os.replace(tmp_path, path)
+
+def record(index, chart, release_date, stored):
+  digest, size = stored
+  index['figures'].setdefault(chart, {})[str(release_date)] = digest
+  index['blobs'][digest] = size
+
+def store(index, chart, release_date, png, archive_dir=ARCHIVE_DIR, colors=COLORS):
+  stored = put_blob(png, archive_dir, colors)
+  record(index, chart, release_date, stored)
+  return stored[0]
+
+def contains(index, chart, release_date):
+  return str(release_date) in index['figures'].get(chart, {})
+
+# --- Readers
+# Blob path of figure of chart and release date (None when not archived)
+def figure(index, chart, release_date, archive_dir=ARCHIVE_DIR):
+  digest = index['figures'].get(chart, {}).get(str(release_date))
+  return None if digest is None else blob_path(digest, archive_dir)
+
+# [(release date, sha256)] of chart by release date
+def history(index, chart):
+  return sorted(index['figures'].get(chart, {}).items())
+
+# Release dates on which figure of chart changed (first one included)
+def changes(index, chart):
+  dates, previous = [], None
+  for release_date, digest in history(index, chart):
+    if digest != previous:
+      dates.append((release_date, digest))
+    previous = digest
+  return dates
+
+def summary(index):
+  figures = sum(len(dates) for dates in index['figures'].values())
+  return {'charts': len(index['figures']), 'figures': figures, 'blobs': len(index['blobs']), 'bytes': sum(index['blobs'].values())}
+
+# --- Maintenance
+# Copies dated archive files (<YYYY-MM-DD>_<chart>.png) into the store, delete=True removes them then
+# (stored blobs are quantised to colors, originals are kept by default). Returns (files, bytes of files,
+# bytes of new blobs).
+def migrate(archive_dir=ARCHIVE_DIR, colors=COLORS, delete=False):
+  index = read_index(archive_dir)
+  files, size, added = 0, 0, 0
+  for name in sorted(os.listdir(archive_dir)):
+    match = DATED.match(name)
+    if match is None:
+      continue
+    path = os.path.join(archive_dir, name)
+    blobs = len(index['blobs'])
+    with open(path, 'rb') as f:
+      digest = store(index, match.group(2), match.group(1), f.read(), archive_dir, colors)
+    files += 1
+    size += os.path.getsize(path)
+    added += index['blobs'][digest] if len(index['blobs']) > blobs else 0
+    if delete:
+      os.remove(path)
+  write_index(index, archive_dir)
+  return files, size, added
+
+# Removes blobs no figure refers to (figures replaced by --force renders), returns removed blobs
+def prune(archive_dir=ARCHIVE_DIR):
+  index = read_index(archive_dir)
+  used = {digest for dates in index['figures'].values() for digest in dates.values()}
+  removed = 0
+  for digest in [digest for digest in index['blobs'] if digest not in used]:
+    try:
+      os.remove(blob_path(digest, archive_dir))
+    except OSError:
+      pass
+    del index['blobs'][digest]
+    removed += 1
+  write_index(index, archive_dir)
+  return removed
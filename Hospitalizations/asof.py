@@ -0,0 +1,107 @@
+import os
+import datetime
+import functools
+import pandas as pd
+from . import CHARTS
+from .batch import chart_module
+from .data import load_charts
+from .cube import build, as_cube, periods
+from .scheduler import Scheduler
+from . import archive
+
+# --- As-of rendering of dated archive figures
+# Chart is rendered as it would have looked on cutoff date, i.e. from rows with Date <= cutoff of the
+# loaded data set (later revisions of already published dates are kept, only later dates are left out).
+# Every data set is loaded (rows of date windows of its charts) and its count cube (cube.py) built and
+# aggregated once: per period values and moving averages depend only on preceding periods, so frames as
+# of cutoff are a prefix of frames computed from all dates. Only the period containing the cutoff is aggregated again (from a slice of the cube)
+# for charts with monthly values. Frames of daily charts are shared with render processes once, figure
+# as of cutoff is rendered from their first rows.
+# Figures are stored in the content-addressed archive (archive.py) by the render process, the archive
+# index is written once all figures are rendered.
+
+# Cutoff dates from list of dates and/or date range (freq 'D' every day, 'B' business days)
+def cutoffs(dates=(), start=None, end=None, freq='D'):
+  days = pd.DatetimeIndex(pd.to_datetime(list(dates)))
+  if start is not None:
+    days = days.append(pd.date_range(start, end or datetime.date.today(), freq=freq))
+  return days.normalize().unique().sort_values()
+
+# Per period values and frames with moving averages of all dates (raw rows or their cube)
+def prefix_aggregates(module, raw):
+  base = module.aggregate(raw)
+  return base, module.moving_average(base)
+
+# Chart frames as of cutoff - same as module.prepare(raw.loc[raw['Date'] <= cutoff])
+def frames_as_of(module, raw, base, frames, cutoff):
+  period = periods([cutoff], module.GRAIN)[0]
+  if module.GRAIN == 'D':
+    return {name: frame.loc[:period] for name, frame in frames.items()}
+
+  # --- Period containing cutoff aggregated from its dates up to cutoff
+  rows = as_cube(raw).between(period, cutoff)
+  part = module.aggregate(rows) if len(rows) else None
+
+  # Moving average of partial period with WINDOW preceding rows as window state
+  tails, offsets = {}, {}
+  for name, values in base.items():
+    first = values.index.searchsorted(period)
+    offsets[name] = (first, max(first - module.WINDOW, 0))
+    new = part[name] if part is not None else values.iloc[0:0]
+    tails[name] = pd.concat([values.iloc[offsets[name][1]:first], new]) if len(new) else values.iloc[offsets[name][1]:first]
+
+  tails = module.moving_average(tails)
+  return {name: pd.concat([frames[name].iloc[:first], tails[name].iloc[first - tail_start:]]) for name, (first, tail_start) in offsets.items()}
+
+# --- Render charts as of every cutoff date
+# Figures are rendered in parallel by jobs processes (scheduler.py), a failed figure does not stop the others.
+# Figures already in archive are kept unless force=True. Returns list of rendered (chart, date).
+def render_as_of(days, charts=CHARTS, archive_dir=archive.ARCHIVE_DIR, jobs=None, force=False, streaming=False):
+  modules = [chart_module(name) for name in charts]
+
+  datasets = {}
+  for module in modules:
+    datasets.setdefault(module.DATASET, []).append(module)
+
+  index = archive.read_index(archive_dir)
+  tmp_dir = os.path.join(archive_dir, 'tmp')
+  os.makedirs(tmp_dir, exist_ok=True)
+  store = functools.partial(archive.store_file, archive_dir=archive_dir)
+  rendered = []
+  with Scheduler(jobs) as scheduler:
+    for dataset, dataset_modules in datasets.items():
+      data = load_charts(dataset, dataset_modules, streaming=streaming)
+      if data is None:
+        print('Data set ' + dataset + ' is not available, skipped: ' + ', '.join(m.__name__ for m in dataset_modules))
+        continue
+      cube = build(data[0])
+
+      for module in dataset_modules:
+        name = module.__name__.rsplit('.', 1)[-1]
+        base, frames = prefix_aggregates(module, cube)
+        shared = scheduler.share(frames) if module.GRAIN == 'D' else None
+        for cutoff in days:
+          key = (name, cutoff.date())
+          if not force and archive.contains(index, *key):
+            continue
+          output = os.path.join(tmp_dir, '%s_%s.png' % (cutoff.strftime('%Y-%m-%d'), name))
+          if shared is not None:
+            rows = {frame_name: frame.index.searchsorted(cutoff, side='right') for frame_name, frame in frames.items()} # frame.loc[:cutoff]
+            scheduler.submit(key, name, shared, cutoff.date(), output, rows=rows, store=store)
+          else:
+            scheduler.submit(key, name, scheduler.share(frames_as_of(module, cube, base, frames, cutoff)), cutoff.date(), output, store=store)
+
+    try:
+      for key, result, error in scheduler.results():
+        if error is not None:
+          print('Failed %s %s - %s: %s' % (key + (type(error).__name__, error)))
+          continue
+        archive.record(index, *key, result[0])
+        print('Archived %s %s' % key)
+        rendered.append(key)
+    finally:
+      archive.write_index(index, archive_dir)
+  if not os.listdir(tmp_dir):
+    os.rmdir(tmp_dir)
+
+  return sorted(rendered)
@@ -0,0 +1,151 @@
+import os
+import importlib
+import functools
+import contextlib
+from . import CHARTS
+from . import manifest
+from . import export
+from . import archive
+from .data import DATASETS, load_charts
+from .cube import build, GRAINS
+from .fetch import content_hash
+from .sources import fetch_all
+from .instrument import stage, emit, rows, file_size
+from .scheduler import Scheduler
+
+def chart_module(name):
+  return importlib.import_module('.' + name, __package__)
+
+# Chart constants set for one block, e.g. with constants(module, {'WINDOW': 14}): module.plot(...)
+@contextlib.contextmanager
+def constants(module, values):
+  defaults = {key: getattr(module, key) for key in values}
+  try:
+    for key, value in values.items():
+      setattr(module, key, value)
+    yield module
+  finally:
+    for key, value in defaults.items():
+      setattr(module, key, value)
+
+# Chart constants of chart variant with values per period of grain, rendered next to chart figure
+# (e.g. Admissions_Stacked_by_Age_Daily_W.png), None is chart itself
+def variant(module, grain=None):
+  if grain is None:
+    return {}
+  if grain not in GRAINS:
+    raise ValueError('grain must be one of ' + ', '.join(GRAINS))
+  root, extension = os.path.splitext(module.OUTPUT)
+  return {'GRAIN': grain, 'OUTPUT': root + '_' + grain + extension}
+
+# --- Render charts in one process
+# Every data set is downloaded, parsed and cleansed once and its count cube (cube.py) is built once
+# and shared by all charts using it. Only rows of date windows of its charts (chart dates) are loaded.
+# Charts with unchanged fingerprint in manifest are skipped (force=True renders them anyway,
+# dry_run=True only reports what would be rendered).
+# incremental=True recomputes only newly published or revised dates (full=True rebuilds stored state),
+# verify=True compares incremental frames with full recompute and returns the differences.
+# streaming=True builds charts from admission counts aggregated chunk by chunk (bounded memory).
+# export_frames=True writes chart frames as CSV and memory-mappable columns (export.py), also for unchanged figures.
+# grain ('D', 'W', 'M', 'Q') renders chart variants with values per period of grain instead (variant).
+# archive_dir stores every rendered figure also in the figure archive (archive.py) under its release date,
+# figure not in archive yet is rendered even with unchanged fingerprint.
+# Figures are rendered by jobs processes (scheduler.py, default number of CPUs), a failed chart does not
+# stop the others. Returns the differences and failed charts.
+def render_all(charts=CHARTS, incremental=False, full=False, verify=False, streaming=False, force=False, dry_run=False, export_frames=False, grain=None, jobs=None, archive_dir=None):
+  modules = [chart_module(name) for name in charts]
+  with contextlib.ExitStack() as stack:
+    for module in modules:
+      stack.enter_context(constants(module, variant(module, grain)))
+    scheduler = stack.enter_context(Scheduler(1 if dry_run else jobs))
+    return render_modules(modules, scheduler, grain, incremental, full, verify, streaming, force, dry_run, export_frames, archive_dir)
+
+def render_modules(modules, scheduler, grain=None, incremental=False, full=False, verify=False, streaming=False, force=False, dry_run=False, export_frames=False, archive_dir=None):
+  datasets = {}
+  for module in modules:
+    datasets.setdefault(module.DATASET, []).append(module)
+
+  # Source files of all data sets downloaded concurrently
+  with stage('fetch', ', '.join(datasets)) as s:
+    paths = fetch_all(DATASETS[dataset][0] for dataset in datasets)
+    s.count(bytes_written=sum(file_size(path) or 0 for path in paths.values()))
+
+  rendered = manifest.read()
+  index = archive.read_index(archive_dir) if archive_dir else None
+  store = functools.partial(archive.store_file, archive_dir=archive_dir, remove=False) if archive_dir else None
+  differences = []
+  jobs = {}
+  for dataset, dataset_modules in datasets.items():
+    path = paths[DATASETS[dataset][0]]
+    data = load_charts(dataset, dataset_modules, streaming=streaming, path=path) if path else None # Rows of charts date windows only
+    if data is None:
+      print('Data set ' + dataset + ' is not available, skipped: ' + ', '.join(m.__name__ for m in dataset_modules))
+      continue
+    raw, release_date, windows = data
+    source = (DATASETS[dataset][0], content_hash(DATASETS[dataset][0]))
+
+    if incremental:
+      from . import incremental as inc
+      prints = inc.fingerprints(raw)
+    else:
+      with stage('cube', dataset) as s:
+        cube = build(raw)
+        s.count(rows_in=len(raw), rows_out=cube.counts.size, bytes_written=cube.nbytes)
+
+    for module in dataset_modules:
+      name = manifest.entry_name(module)
+      with stage('fingerprint', name) as s:
+        fingerprint = manifest.fingerprint(module, raw, release_date, windows[name])
+        s.count(rows_in=len(raw))
+      figure_current = not force and manifest.is_current(rendered, module, fingerprint)
+      if index is not None and not archive.contains(index, name, release_date):
+        figure_current = False
+      export_current = not export_frames or (not force and export.is_current(name, fingerprint))
+      if figure_current and export_current:
+        print(name + ': unchanged')
+        continue
+      if dry_run:
+        print(name + ': would be ' + ('exported' if figure_current else 'rendered'))
+        continue
+
+      if incremental:
+        with stage('update', name) as s:
+          frames = inc.update(module, raw, prints, full=full)
+          s.count(rows_in=len(raw), rows_out=rows(frames))
+        if verify:
+          with stage('verify', name):
+            differences += inc.verify(module, raw, frames)
+      else:
+        with stage('aggregate', name) as s:
+          base = module.aggregate(cube)
+          s.count(rows_in=len(raw), rows_out=rows(base))
+        with stage('rolling', name) as s:
+          frames = module.moving_average(base)
+          s.count(rows_in=rows(base), rows_out=rows(frames))
+      if not figure_current:
+        scheduler.submit(name, manifest.chart_name(module), scheduler.share(frames), release_date, module.OUTPUT, variant(module, grain), store=store)
+        jobs[name] = (module, fingerprint, release_date, source, rows(frames))
+      if not export_current:
+        with stage('export', name) as s:
+          export.write(name, frames, release_date, fingerprint, manifest.visible_range(module))
+          s.count(rows_in=rows(frames))
+        print(name + ': exported')
+
+  # --- Rendered figures recorded in manifest as they complete
+  failed = []
+  for name, result, error in scheduler.results():
+    module, fingerprint, release_date, source, frame_rows = jobs[name]
+    if error is not None:
+      failed.append('%s: render failed - %s: %s' % (name, type(error).__name__, error))
+      print(failed[-1])
+      continue
+    stored, wall, cpu = result
+    emit('render', name, wall, cpu, rows_in=frame_rows, bytes_written=file_size(module.OUTPUT))
+    manifest.record(rendered, module, fingerprint, release_date, source)
+    manifest.write(rendered)
+    if index is not None:
+      archive.record(index, name, release_date, stored)
+      archive.write_index(index, archive_dir)
+    print(name + ': rendered' + (' and archived' if index is not None else ''))
+
+  return differences + failed
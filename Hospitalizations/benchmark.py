@@ -0,0 +1,189 @@
+import io
+import os
+import json
+import time
+import shutil
+import hashlib
+import platform
+import tempfile
+import tracemalloc
+import datetime
+import subprocess
+from . import CHARTS
+from . import synthetic
+from .batch import chart_module
+from .cube import build
+from .data import DATASETS, DATE_FORMAT, load, read_hospital_csv
+from .template import plt
+
+BENCHMARK_DIR = os.environ.get('IZA_BENCHMARK_DIR', './.cache/benchmarks')
+STAGES = ['download', 'parse', 'cleanse', 'cube', 'aggregate', 'rolling', 'render']
+
+# --- Render micro-benchmark
+# Per render cost of every chart with figure built from scratch (plot, savefig, close) and with
+# reused figure template (swap data, savefig). Figures are saved as PNG into memory.
+def render_cost(charts=CHARTS, repeat=10):
+  results = []
+  datasets = {}
+  for name in charts:
+    module = chart_module(name)
+    if module.DATASET not in datasets:
+      datasets[module.DATASET] = load(module.DATASET)
+    if datasets[module.DATASET] is None:
+      print('Data set ' + module.DATASET + ' is not available, skipped: ' + name)
+      continue
+    raw, release_date = datasets[module.DATASET]
+    frames = module.prepare(raw)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+      fig = module.plot(frames, release_date)
+      fig.savefig(io.BytesIO(), format='png')
+      plt.close(fig)
+    scratch = (time.perf_counter() - start) / repeat
+
+    module.TEMPLATE.render(frames, release_date, io.BytesIO()) # Layout built on first render
+    start = time.perf_counter()
+    for _ in range(repeat):
+      module.TEMPLATE.render(frames, release_date, io.BytesIO())
+    template = (time.perf_counter() - start) / repeat
+
+    results.append((name, scratch, template))
+  return results
+
+def print_render_cost(results):
+  print('%-56s %13s %13s %8s' % ('chart', 'scratch [ms]', 'template [ms]', 'speedup'))
+  for name, scratch, template in results:
+    print('%-56s %13.1f %13.1f %7.2fx' % (name, scratch * 1000, template * 1000, scratch / template))
+
+# --- Offline benchmark suite
+# Synthetic source files (synthetic.py) of every data set go through the stages of the daily run:
+#   download  - copy into cache directory with SHA-256 (download stub, no network)
+#   parse     - typed CSV read
+#   cleanse   - data set cleansing
+#   cube      - count cube of data set (cube.py), shared by its charts
+#   aggregate - chart aggregation per date / month (marginals of cube, weighted averages)
+#   rolling   - moving averages
+#   render    - figure saved as PNG
+# Wall time and peak memory of every stage are recorded - traced memory (tracemalloc, peak reset on every
+# stage start as by instrument.py) above memory traced at stage start, so memory kept by earlier stages does
+# not count. Results are saved as JSON named by time and git commit so runs can be compared across commits.
+# Memory tracing slows down allocation heavy stages, trace_memory=False records times only.
+# SHA-256 of every synthetic source file is recorded, runs of the same input can be told apart.
+def timed(records, name, stage, function, *args, **kwargs):
+  if tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak'):
+    tracemalloc.reset_peak()
+  traced = tracemalloc.get_traced_memory()[0]
+  start = time.perf_counter()
+  value = function(*args, **kwargs)
+  seconds = time.perf_counter() - start
+  peak = (tracemalloc.get_traced_memory()[1] - traced) / 1024 / 1024 if tracemalloc.is_tracing() else None
+  records.append({'name': name, 'stage': stage, 'seconds': seconds, 'peak_mb': peak})
+  return value
+
+# Returns path of copy in cache directory and its SHA-256
+def download_stub(source, cache_dir):
+  path = os.path.join(cache_dir, os.path.basename(source))
+  sha = hashlib.sha256()
+  with open(source, 'rb') as src, open(path, 'wb') as dst:
+    for chunk in iter(lambda: src.read(1024 * 1024), b''):
+      dst.write(chunk)
+      sha.update(chunk)
+  return path, sha.hexdigest()
+
+def git_commit():
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+      universal_newlines=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return 'unknown'
+
+def versions():
+  import numpy, pandas, matplotlib
+  result = {'python': platform.python_version(), 'numpy': numpy.__version__, 'pandas': pandas.__version__, 'matplotlib': matplotlib.__version__}
+  try:
+    import pyarrow
+    result['pyarrow'] = pyarrow.__version__
+  except ImportError:
+    pass
+  return result
+
+def suite(charts=CHARTS, scale=1, days=synthetic.DAYS, age_groups=synthetic.AGE_GROUPS, rows_per_key=synthetic.ROWS_PER_KEY, trace_memory=True):
+  modules = [chart_module(name) for name in charts]
+  records, rows, sources, charts_datasets = [], {}, {}, {}
+  work_dir = tempfile.mkdtemp(prefix='iza-benchmark-')
+  tracing = trace_memory and not tracemalloc.is_tracing()
+  if tracing:
+    tracemalloc.start()
+  try:
+    cache_dir = os.path.join(work_dir, 'cache')
+    os.makedirs(cache_dir)
+    data = {}
+    for dataset in sorted({module.DATASET for module in modules}):
+      source = synthetic.generate(os.path.join(work_dir, dataset + '.csv'), dataset, days=days, age_groups=age_groups, rows_per_key=rows_per_key, scale=scale)
+      path, sources[dataset] = timed(records, dataset, 'download', download_stub, source, cache_dir)
+      raw = timed(records, dataset, 'parse', read_hospital_csv, path)
+      rows[dataset] = len(raw)
+      raw = timed(records, dataset, 'cleanse', DATASETS[dataset][1], raw)
+      release_date = raw['Date'].iloc[0].strftime(DATE_FORMAT)
+      data[dataset] = timed(records, dataset, 'cube', build, raw), release_date
+
+    for module in modules:
+      name = module.__name__.rsplit('.', 1)[-1]
+      charts_datasets[name] = module.DATASET
+      cube, release_date = data[module.DATASET]
+      base = timed(records, name, 'aggregate', module.aggregate, cube)
+      frames = timed(records, name, 'rolling', module.moving_average, base)
+      timed(records, name, 'render', module.render, frames, release_date, output=os.path.join(work_dir, name + '.png'))
+  finally:
+    if tracing:
+      tracemalloc.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+  return {
+    'created': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    'commit': git_commit(),
+    'versions': versions(),
+    'generator': {'scale': scale, 'days': days, 'age_groups': age_groups, 'rows_per_key': rows_per_key},
+    'rows': rows,
+    'sources': sources,
+    'charts': charts_datasets,
+    'records': records,
+  }
+
+def save(result, benchmark_dir=BENCHMARK_DIR):
+  os.makedirs(benchmark_dir, exist_ok=True)
+  path = os.path.join(benchmark_dir, '%s-%s-x%s.json' % (result['created'].replace(':', '').replace('-', ''), result['commit'], result['generator']['scale']))
+  with open(path, 'w', encoding='utf-8') as f:
+    json.dump(result, f, indent=2)
+    f.write('\n')
+  return path
+
+def read(path):
+  with open(path, 'r', encoding='utf-8') as f:
+    return json.load(f)
+
+# Stage times of every chart (data set stages are shared by charts of the data set)
+def chart_stages(result):
+  stages = {}
+  for record in result['records']:
+    stages.setdefault(record['name'], {})[record['stage']] = record
+  return {name: dict(stages[dataset], **stages[name]) for name, dataset in result['charts'].items()}
+
+def print_suite(result):
+  print('commit %s, scale x%s, rows %s' % (result['commit'], result['generator']['scale'], ', '.join('%s %d' % item for item in result['rows'].items())))
+  print('%-56s' % 'chart' + ''.join('%10s' % stage for stage in STAGES) + '%10s%12s' % ('total [s]', 'peak [MB]'))
+  for name, stages in chart_stages(result).items():
+    seconds = [stages[stage]['seconds'] if stage in stages else 0 for stage in STAGES]
+    peak = max(record.get('peak_mb') or 0 for record in stages.values()) # Highest stage peak, 0 without memory tracing
+    print('%-56s' % name + ''.join('%10.3f' % value for value in seconds) + '%10.3f%12.1f' % (sum(seconds), peak))
+
+# Stage times of two saved results side by side
+def print_compare(old, new):
+  print('%-56s %-10s %10s %10s %8s' % ('chart', 'stage', old['commit'], new['commit'], 'ratio'))
+  old_stages = chart_stages(old)
+  for name, stages in chart_stages(new).items():
+    for stage in STAGES:
+      if stage in stages and stage in old_stages.get(name, {}):
+        before, after = old_stages[name][stage]['seconds'], stages[stage]['seconds']
+        print('%-56s %-10s %10.3f %10.3f %7.2fx' % (name, stage, before, after, after / before if before else float('nan')))
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from .data import VACCINATED
+from .stats import values, numeric
+
+# --- Admission count cube
+# Dense admission counts by Date x age_group x Vaccinated, shared by all charts of a data set:
+#   dates  - dates with rows (DatetimeIndex named Date), first axis
+#   ages   - age_group values with rows, second axis, its last slot is unknown age (NaN age_group)
+#   status - VACCINATED (unknown status included), third axis
+#   counts - int64 array [date, age slot, status] of summed Admissions
+#   rows   - int64 array [date] of source rows
+# The cube is built in one pass over the rows: every axis is integer coded (days since first date,
+# age_group minus the lowest one, category code) and admissions are accumulated by np.bincount of the
+# flat cell index. Empty dates and age groups are dropped afterwards, so dates are the groups of
+# raw.groupby('Date'). Charts take marginals and slices of the cube and build their frames at the end.
+# Age slots can be merged into user-defined bins (rebin) and every marginal expressed as percentage
+# composition per date (shares), e.g. shares('age') of cube.rebin([0, 20, 60]) - 0-19, 20-59, 60+.
+# Coarser grains are rolled up from the daily cube by summing its counts (never from rows), every level
+# from the finest level it nests in (quarters from months when months were rolled up already):
+#   D day -> W ISO week (Monday)
+#   D day -> M month -> Q quarter
+# Rolled up cubes are kept by the cube they are rolled up from, so charts of one grain share them.
+AXES = ['date', 'age', 'status']
+UNKNOWN = VACCINATED.index('unknown')
+GRAINS = ['D', 'W', 'M', 'Q']
+PARENTS = {'W': ['D'], 'M': ['D'], 'Q': ['D', 'M']} # Grains periods of grain are made of, finest first
+GRAIN_DAYS = {'D': 1, 'W': 7, 'M': 31, 'Q': 92} # Longest period of grain (days)
+
+# First dates of periods of dates - 'D' day, 'W' ISO week (Monday), 'M' month, 'Q' quarter
+def periods(dates, grain):
+  if grain == 'D':
+    return pd.DatetimeIndex(dates)
+  dates = np.asarray(dates, dtype='datetime64[ns]')
+  if grain == 'W':
+    days = dates.astype('datetime64[D]')
+    return pd.DatetimeIndex(days - ((days.view(np.int64) + 3) % 7).astype('timedelta64[D]')) # 1970-01-01 is Thursday
+  months = dates.astype('datetime64[M]')
+  if grain == 'M':
+    return pd.DatetimeIndex(months)
+  if grain == 'Q':
+    return pd.DatetimeIndex(months - (months.view(np.int64) % 3).astype('timedelta64[M]'))
+  raise ValueError('grain must be one of D, W, M, Q')
+
+class Cube:
+  def __init__(self, dates, ages, counts, rows, grain='D'):
+    self.dates = dates
+    self.ages = ages
+    self.counts = counts
+    self.rows = rows
+    self.grain = grain
+    self.rollups = {}
+
+  # Number of source rows
+  def __len__(self):
+    return int(self.rows.sum())
+
+  @property
+  def nbytes(self):
+    return self.dates.nbytes + self.ages.nbytes + self.counts.nbytes + self.rows.nbytes
+
+  # --- Slices
+  def select(self, mask):
+    return Cube(self.dates[mask], self.ages, self.counts[mask], self.rows[mask], self.grain)
+
+  # Dates from start to end (both included, None is open)
+  def between(self, start=None, end=None):
+    first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+    last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+    return self.select(slice(first, last))
+
+  # Cube of periods of grain ('D', 'W', 'M', 'Q') - dates are first dates of periods
+  def rollup(self, grain):
+    if grain == self.grain:
+      return self
+    if grain not in self.rollups:
+      if self.grain not in PARENTS.get(grain, []):
+        raise ValueError('%s periods can not be rolled up from %s periods' % (grain, self.grain))
+      source = next((self.rollups[parent] for parent in reversed(PARENTS[grain]) if parent in self.rollups), self)
+      self.rollups[grain] = source.resum(grain)
+    return self.rollups[grain]
+
+  # Counts of dates summed into periods of grain
+  def resum(self, grain):
+    starts = periods(self.dates, grain)
+    if len(starts) == 0:
+      return Cube(starts.rename('Date'), self.ages, self.counts, self.rows, grain)
+    first = np.flatnonzero(np.concatenate(([True], starts[1:] != starts[:-1]))) # Dates are sorted
+    return Cube(starts[first].rename('Date'), self.ages, np.add.reduceat(self.counts, first, axis=0), np.add.reduceat(self.rows, first), grain)
+
+  # Cube of age bins given by ascending lower bounds of age_group, ages are the lower bounds then
+  # Ages below the first bound are in the first bin (bin_labels). Source rows are not touched.
+  def rebin(self, bounds):
+    bounds = np.asarray(bounds, dtype=np.float64)
+    slot = np.maximum(np.searchsorted(bounds, self.ages, side='right') - 1, 0)
+    slot = np.append(slot, len(bounds)) # Unknown age stays unknown
+    merge = np.zeros((len(slot), len(bounds) + 1), dtype=self.counts.dtype)
+    merge[np.arange(len(slot)), slot] = 1
+    return Cube(self.dates, bounds, np.einsum('das,ab->dbs', self.counts, merge), self.rows, self.grain)
+
+  # --- Marginals
+  # Admissions per date and the given axes, e.g. sum() per date, sum('status') per date and status,
+  # sum('age', known_age=True) per date and age_group without unknown age slot
+  def sum(self, *axes, known_age=False):
+    counts = self.counts[:, :-1] if known_age else self.counts
+    return counts.sum(axis=tuple(i for i, axis in enumerate(AXES) if i and axis not in axes))
+
+  # Sums of w, w*x and w*x^2 of known age_group (x) weighted by admissions (w) per date (and status),
+  # same values as stats.weighted_sums of raw rows
+  def weighted_sums(self, by=None):
+    w = self.sum('age', *([by] if by else []), known_age=True).astype(np.float64)
+    x = self.ages.reshape((1, -1) + (1,) * (w.ndim - 2))
+    return w.sum(axis=1), (w * x).sum(axis=1), (w * x * x).sum(axis=1)
+
+  # Percentage composition per date along the given axes ('age', 'status' or both) - marginal divided
+  # by its total per date in one broadcasted operation, dates without admissions are NaN
+  def shares(self, *axes, known_age=True):
+    counts = self.sum(*axes, known_age=known_age).astype(np.float64)
+    total = counts.reshape(len(counts), -1).sum(axis=1).reshape((-1,) + (1,) * (counts.ndim - 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+      return (counts / total)*100
+
+  # Frame (or series) of marginal indexed by dates, marginal along more axes has column MultiIndex
+  # of product of columns of every axis
+  def frame(self, values, columns=None):
+    if values.ndim == 1:
+      return pd.Series(values, index=self.dates)
+    if values.ndim > 2:
+      columns = pd.MultiIndex.from_product(columns)
+      values = values.reshape(len(values), -1)
+    return pd.DataFrame(values, index=self.dates, columns=columns)
+
+# Labels of age bins given by lower bounds, e.g. [0, 20, 60] -> 0-19, 20-59, 60+
+# First bin holds all ages below the second bound, e.g. [50] -> 0+, [20, 60] -> 0-59, 60+
+def bin_labels(bounds):
+  lows = [min(bounds[0], 0)] + list(bounds[1:])
+  return ['%g-%g' % (low, high - 1) for low, high in zip(lows[:-1], bounds[1:])] + ['%g+' % lows[-1]]
+
+# Slots of used codes (codes >= 0) - returns slot of every code, used codes and their number of rows
+def slots(codes, size):
+  rows = np.bincount(codes, minlength=size)
+  used = np.flatnonzero(rows)
+  slot = np.zeros(size, dtype=np.int64)
+  slot[used] = np.arange(len(used))
+  return slot[codes], used, rows[used]
+
+# Cube of raw rows (or of streamed counts - same columns)
+# Row sized temporaries are int64 codes (updated in place), float64 age_group and Admissions (weights).
+def build(raw):
+  date = values(raw, 'Date').to_numpy()
+  unit = date.dtype if date.dtype.kind == 'M' else np.dtype('datetime64[ns]')
+  day = date.astype('datetime64[D]').view(np.int64)
+  age = numeric(raw, 'age_group')
+  status = pd.Categorical(values(raw, 'Vaccinated'), categories=VACCINATED).codes
+  admissions = np.nan_to_num(numeric(raw, 'Admissions')) # NaN Admissions count as 0
+
+  valid = day != np.datetime64('NaT').view(np.int64) # Rows without Date are left out (as by groupby)
+  if not valid.all():
+    day, age, status, admissions = day[valid], age[valid], status[valid], admissions[valid]
+  status = np.where(status < 0, UNKNOWN, status)
+  if len(day) == 0:
+    return Cube(pd.DatetimeIndex([], dtype=unit, name='Date'), np.empty(0), np.zeros((0, 1, len(VACCINATED)), dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+  # --- Integer codes of axes (age_group is integral by schema)
+  first_day = day.min()
+  day -= first_day
+  cell, used_days, rows = slots(day, day.max() + 1)
+  del day
+  known = ~np.isnan(age)
+  low = age[known].min() if known.any() else 0.0
+  age_code = np.where(known, age - low, 0).astype(np.int64)
+  del age
+  age_code[known], used_ages, _ = slots(age_code[known], age_code.max() + 1)
+  ages = used_ages + low
+  age_code[~known] = len(ages) # Unknown age slot
+
+  # --- Accumulation - flat cell index (date slot, age slot, status) computed in place
+  shape = (len(used_days), len(ages) + 1, len(VACCINATED))
+  cell *= shape[1]
+  cell += age_code
+  cell *= shape[2]
+  cell += status
+  counts = np.rint(np.bincount(cell, weights=admissions, minlength=np.prod(shape))).astype(np.int64).reshape(shape)
+  dates = pd.DatetimeIndex((used_days + first_day).astype('datetime64[D]').astype(unit), name='Date')
+  return Cube(dates, ages.astype(np.float64), counts, rows.astype(np.int64))
+
+def as_cube(data):
+  return data if isinstance(data, Cube) else build(data)
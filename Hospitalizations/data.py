@@ -0,0 +1,159 @@
+import os
+import numpy as np
+import pandas as pd
+from .fetch import fetch, content_hash
+from . import snapshot
+from .instrument import stage
+
+# Optional multithreaded CSV parser
+try:
+  import pyarrow as pa
+  import pyarrow.csv as pa_csv
+except ImportError:
+  pa = None
+
+# --- Source data sets
+URI_ADMISSIONS = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_AdmissionDischarge.csv'
+URI_UPV = 'https://raw.githubusercontent.com/Institut-Zdravotnych-Analyz/covid19-data/main/Hospitals/OpenData_Slovakia_Covid_Hospital_UPV_AdmissionDischarge.csv'
+
+# --- Schema of IZA hospital files
+# Date       -> datetime64
+# age_group  -> Int8 (nullable), lower bound of 10 years age group
+# Vaccinated -> category: unvaccinated (False) / vaccinated (True) / unknown (NaN)
+# Admissions -> int32
+VACCINATED = ['unvaccinated', 'vaccinated', 'unknown']
+DATE_FORMAT = '%Y-%m-%d'
+
+def vaccinated_category(values):
+  text = pd.Series(values, dtype='string').str.lower().to_numpy(dtype=object, na_value='')
+  codes = np.full(len(text), 2, dtype=np.int8) # unknown
+  codes[(text == 'false') | (text == '0')] = 0
+  codes[(text == 'true') | (text == '1')] = 1
+  return pd.Categorical.from_codes(codes, categories=VACCINATED)
+
+def arrow_options(columns=None):
+  return dict(
+    parse_options=pa_csv.ParseOptions(delimiter=';'),
+    convert_options=pa_csv.ConvertOptions(
+      column_types={'Date': pa.string(), 'age_group': pa.int8(), 'Vaccinated': pa.string(), 'Admissions': pa.int32()},
+      include_columns=columns,
+      strings_can_be_null=True))
+
+def arrow_to_pandas(table):
+  return table.to_pandas(types_mapper={pa.int8(): pd.Int8Dtype()}.get)
+
+def read_csv_arrow(path):
+  raw = arrow_to_pandas(pa_csv.read_csv(path, **arrow_options()))
+  return raw.set_index(raw.columns[0])
+
+PANDAS_DTYPES = {'Date': str, 'age_group': 'Int8', 'Vaccinated': str, 'Admissions': 'Int32'} # Blank Admissions filled by convert (as by pyarrow)
+
+def read_csv_pandas(path):
+  return pd.read_csv(path, sep=';', index_col=0, dtype=PANDAS_DTYPES)
+
+# Conversion of parsed columns to schema types
+def convert(raw):
+  raw['Date'] = pd.to_datetime(raw['Date'], format=DATE_FORMAT) # Vectorized date conversion
+  raw['Vaccinated'] = vaccinated_category(raw['Vaccinated'])
+  raw['Admissions'] = raw['Admissions'].fillna(0).astype(np.int32)
+  return raw
+
+# Typed read of IZA hospital file (pyarrow when installed, pandas otherwise)
+def read_hospital_csv(path):
+  raw = read_csv_arrow(path) if pa is not None else read_csv_pandas(path)
+  return convert(raw)
+
+# --- Cleansing
+def cleanse_admissions(raw):
+  # NaN Vaccinated status is already read as unknown
+  #raw['age_group'] = raw['age_group'].fillna(value=55) # Replace NaN with value 55 (average age of unvaccinated COVID-19 patient) - currently in use in Daily admissions axis only
+  raw['age_group'] = raw['age_group']+5 # Middle value of age_group (e.g. age_group 0 = 0-10 age --> will be 5)
+  return raw
+
+def cleanse_upv(raw):
+  return raw
+
+# Data set -> (source uri, cleansing, cleansing version)
+# Cleansing version is stamped into snapshots, bump it whenever cleansing rules change.
+DATASETS = {
+  'admissions': (URI_ADMISSIONS, cleanse_admissions, 2), # 2: age_group middle value (1.0.5)
+  'upv': (URI_UPV, cleanse_upv, 1),
+}
+
+# Rows of date window (first, last), None is open
+def between(raw, dates):
+  if dates is None:
+    return raw
+  mask = np.ones(len(raw), dtype=bool)
+  if dates[0] is not None:
+    mask &= (raw['Date'] >= dates[0]).to_numpy()
+  if dates[1] is not None:
+    mask &= (raw['Date'] <= dates[1]).to_numpy()
+  return raw.loc[mask]
+
+# Returns (raw, release_date) of data set, None when source is not available
+# Parsed and cleansed data set is read from snapshot when source file is unchanged.
+# streaming=True reads the file in chunks and returns admission counts per (Date, age_group, Vaccinated)
+# instead of raw rows - same columns, so every chart is built from it the same way.
+# path of already downloaded source file (sources.fetch_all) skips the download.
+# dates (first, last) returns only rows of date window (load_charts), rows outside it are not read from
+# snapshot; the snapshot itself holds all rows (written once per release).
+def load(dataset, streaming=False, path=None, dates=None):
+  uri, cleanse, version = DATASETS[dataset]
+  if path is None:
+    with stage('fetch', dataset) as s:
+      path = fetch(uri)
+      s.count(bytes_written=os.path.getsize(path) if path else 0)
+  if not path:
+    return None
+
+  version = str(version) + ('c' if streaming else '')
+  with stage('snapshot', dataset) as s:
+    digest = content_hash(uri)
+    data = snapshot.read(dataset, digest, version, dates)
+    s.count(rows_out=len(data[0]) if data is not None else 0)
+  if data is not None:
+    return data
+
+  with stage('parse', dataset) as s:
+    if streaming:
+      from .stream import read_counts
+      raw, release_date = read_counts(path)
+    else:
+      raw = read_hospital_csv(path)
+      release_date = raw['Date'].iloc[0].strftime(DATE_FORMAT)
+    s.count(rows_out=len(raw))
+
+  with stage('cleanse', dataset) as s:
+    raw = cleanse(raw)
+    s.count(rows_in=len(raw), rows_out=len(raw))
+  with stage('store', dataset):
+    snapshot.write(dataset, digest, version, raw, release_date)
+  return between(raw, dates), release_date
+
+# Returns (raw, release_date, windows) of rows of data set for charts (chart modules), None when source is
+# not available. windows are dates every chart is computed from {entry name: (first, last)}, rows of all
+# windows are loaded. Window of chart is its date window (chart dates), unless moving average warm-up of
+# sparse data is too short (manifest.warmed_up of frames aggregated once). Such charts are aggregated
+# once more from all rows and their window starts at manifest.warm_up_start then (None - first date).
+def load_charts(dataset, modules, streaming=False, path=None):
+  from . import manifest
+  from .cube import build
+  windows = {manifest.entry_name(module): manifest.chart_dates(module) for module in modules}
+  dates = manifest.span(windows.values())
+  data = load(dataset, streaming=streaming, path=path, dates=dates)
+  if data is None:
+    return None
+  if dates is None:
+    return data + (windows,)
+  cube = build(data[0])
+  short = [module for module in modules if not manifest.warmed_up(module, module.aggregate(cube))]
+  if not short:
+    return data + (windows,)
+
+  raw, release_date = load(dataset, streaming=streaming, path=path, dates=(None, dates[1]))
+  cube = build(raw)
+  for module in short:
+    name = manifest.entry_name(module)
+    windows[name] = (manifest.warm_up_start(module, module.aggregate(cube)), windows[name][1])
+  return between(raw, manifest.span(windows.values())), release_date, windows
@@ -0,0 +1,101 @@
+import os
+import json
+import shutil
+
+# --- Export of chart frames
+# Every chart frame (result, resultAD, df) is written as CSV and as columnar directory with one .npy
+# file per column, so a single series can be memory-mapped without reading the rest:
+#   <chart>/schema.json           schema version, release date, fingerprint, frames and their columns
+#   <chart>/<frame>.csv           Date and all columns
+#   <chart>/<frame>/<column>.npy  Date as datetime64[D], columns as float64 / int64
+# Column names are stable, non-string columns (age groups of stacked chart) are named <columns name>_<value>.
+# Frames are exported for dates of visible range of chart (x axis, manifest.visible_range) - charts are
+# computed from rows of their date window only (data.load_charts), rows before it are moving average
+# warm-up. The range is recorded as 'dates' in schema.json.
+# numpy and pandas are imported by writers and readers only, schema is checked by precheck.py before heavy imports.
+EXPORT_DIR = os.environ.get('IZA_EXPORT_DIR', './res/Hospitalizations/export')
+SCHEMA_VERSION = 2 # 2: frames of visible range, dates
+INDEX = 'Date'
+
+def column_name(frame, column):
+  return column if isinstance(column, str) else '%s_%s' % (frame.columns.name or 'column', column)
+
+def stable_frame(frame):
+  frame = frame.rename(columns={column: column_name(frame, column) for column in frame.columns})
+  return frame.rename_axis(index=INDEX, columns=None)
+
+def write_frame(directory, name, frame):
+  import numpy as np
+  import pandas as pd
+  columns_dir = os.path.join(directory, name)
+  os.makedirs(columns_dir)
+  frame.to_csv(os.path.join(directory, name + '.csv'), date_format='%Y-%m-%d')
+
+  np.save(os.path.join(columns_dir, INDEX + '.npy'), frame.index.to_numpy().astype('datetime64[D]'))
+  columns = []
+  for column, series in frame.items():
+    values = series.to_numpy(dtype=np.int64 if pd.api.types.is_integer_dtype(series.dtype) else np.float64)
+    np.save(os.path.join(columns_dir, column + '.npy'), values)
+    columns.append({'name': column, 'dtype': values.dtype.name})
+
+  return {
+    'rows': len(frame),
+    'csv': name + '.csv',
+    'index': {'name': INDEX, 'dtype': 'datetime64[D]'},
+    'columns': columns,
+  }
+
+# Rows of frame in dates (first, last), None is all rows
+def trim(frame, dates):
+  if dates is None:
+    return frame
+  return frame.loc[(frame.index >= dates[0]) & (frame.index <= dates[1])]
+
+def write(chart, frames, release_date, fingerprint=None, dates=None, export_dir=EXPORT_DIR):
+  path = os.path.join(export_dir, chart)
+  tmp_path = path + '.tmp'
+  shutil.rmtree(tmp_path, ignore_errors=True)
+  os.makedirs(tmp_path)
+
+  schema = {
+    'schema_version': SCHEMA_VERSION,
+    'chart': chart,
+    'release_date': str(release_date),
+    'fingerprint': fingerprint,
+    'dates': None if dates is None else {'first': dates[0].strftime('%Y-%m-%d'), 'last': dates[1].strftime('%Y-%m-%d')},
+    'frames': {name: write_frame(tmp_path, name, stable_frame(trim(frame, dates))) for name, frame in frames.items()},
+  }
+  with open(os.path.join(tmp_path, 'schema.json'), 'w', encoding='utf-8') as f:
+    json.dump(schema, f, indent=2)
+    f.write('\n')
+
+  shutil.rmtree(path, ignore_errors=True)
+  os.replace(tmp_path, path)
+  return path
+
+def read_schema(chart, export_dir=EXPORT_DIR):
+  try:
+    with open(os.path.join(export_dir, chart, 'schema.json'), 'r', encoding='utf-8') as f:
+      schema = json.load(f)
+  except (OSError, ValueError):
+    return None
+  return schema if schema.get('schema_version') == SCHEMA_VERSION else None
+
+def is_current(chart, fingerprint, export_dir=EXPORT_DIR):
+  schema = read_schema(chart, export_dir)
+  return schema is not None and schema['fingerprint'] == fingerprint
+
+# --- Readers for consumers
+# Memory-mapped values of one column (or Date) of chart frame
+def read_series(chart, frame, column, export_dir=EXPORT_DIR):
+  import numpy as np
+  return np.load(os.path.join(export_dir, chart, frame, column + '.npy'), mmap_mode='r')
+
+def read_frame(chart, frame, columns=None, export_dir=EXPORT_DIR):
+  import pandas as pd
+  schema = read_schema(chart, export_dir)
+  if schema is None:
+    return None
+  names = columns or [column['name'] for column in schema['frames'][frame]['columns']]
+  index = pd.DatetimeIndex(read_series(chart, frame, INDEX, export_dir), name=INDEX)
+  return pd.DataFrame({name: read_series(chart, frame, name, export_dir) for name in names}, index=index, copy=False)
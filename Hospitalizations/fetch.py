@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+import pathlib
+import urllib.parse
+import urllib.request
+
+# --- Local download cache
+# Each source file is stored once on disk, keyed by its URL, together with the HTTP validators
+# (ETag / Last-Modified) of the copy. Later runs revalidate with a conditional GET, so an unchanged
+# upstream file costs one 304 response and zero transferred bytes.
+CACHE_DIR = os.environ.get('IZA_CACHE_DIR', './.cache/iza')
+CACHE_MAX_BYTES = int(os.environ.get('IZA_CACHE_MAX_BYTES', 512 * 1024 * 1024)) # 512 MB
+CACHE_MAX_AGE = int(os.environ.get('IZA_CACHE_MAX_AGE', 30 * 24 * 3600)) # 30 days since last use
+OFFLINE = os.environ.get('IZA_OFFLINE', '') not in ('', '0')
+
+CHUNK_SIZE = 1024 * 1024
+
+# --- Data sources
+# Source files are identified (and cached) by upstream URL, but downloaded from IZA_SOURCE when set:
+#   http(s):// URL of a mirror / local stand-in server, file:// URL or path of a local mirror directory,
+# each holding files with the same names as upstream. file:// URLs are served through the same session
+# as upstream (sources.FileAdapter, incl. conditional requests), so air-gapped runs take the production path.
+SOURCE = os.environ.get('IZA_SOURCE', '')
+
+def location(uri, source=SOURCE):
+  if not source:
+    return uri
+  name = uri.rsplit('/', 1)[-1]
+  if source.startswith(('http://', 'https://', 'file://')):
+    return source.rstrip('/') + '/' + name
+  return pathlib.Path(os.path.abspath(source), name).as_uri()
+
+def file_path(url):
+  return urllib.request.url2pathname(urllib.parse.urlparse(url).path)
+
+# Validator of local file - modification time and size
+def file_etag(path):
+  stat = os.stat(path)
+  return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+def cache_key(uri):
+  return hashlib.sha1(uri.encode('utf-8')).hexdigest()[:16]
+
+def cache_paths(uri, cache_dir=CACHE_DIR):
+  key = cache_key(uri)
+  return os.path.join(cache_dir, key + '.csv'), os.path.join(cache_dir, key + '.json')
+
+def read_meta(meta_path):
+  try:
+    with open(meta_path, 'r', encoding='utf-8') as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+def write_meta(meta_path, meta):
+  tmp_path = meta_path + '.tmp'
+  with open(tmp_path, 'w', encoding='utf-8') as f:
+    json.dump(meta, f, indent=2)
+  os.replace(tmp_path, meta_path)
+
+def cached(uri, cache_dir=CACHE_DIR):
+  data_path, meta_path = cache_paths(uri, cache_dir)
+  meta = read_meta(meta_path)
+  if meta is None or not os.path.exists(data_path):
+    return None, None
+  return data_path, meta
+
+def touch(meta_path, meta):
+  meta['used'] = time.time()
+  write_meta(meta_path, meta)
+
+# Returns local path of an up-to-date copy of uri (or the last good copy when offline / upstream fails),
+# None when there is no usable copy at all.
+def fetch(uri, offline=OFFLINE, cache_dir=CACHE_DIR, print_error=True, evict_cache=True):
+  import requests # Imported only when downloading, cache helpers are used by standard library only precheck
+  from .sources import session
+  os.makedirs(cache_dir, exist_ok=True)
+  data_path, meta_path = cache_paths(uri, cache_dir)
+  cached_path, meta = cached(uri, cache_dir)
+
+  if offline:
+    if cached_path is None and print_error:
+      print('Offline mode: no cached copy of ' + uri)
+    elif cached_path is not None:
+      touch(meta_path, meta)
+    return cached_path
+
+  # --- Conditional GET - revalidate cached copy
+  headers = {}
+  if meta is not None:
+    if meta.get('etag'):
+      headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+      headers['If-Modified-Since'] = meta['last_modified']
+
+  try:
+    with session().get(location(uri), headers=headers, stream=True, timeout=60) as r:
+      if r.status_code == 304 and cached_path is not None:
+        touch(meta_path, meta)
+        return cached_path
+      r.raise_for_status()
+
+      # Download into temporary file, the last good copy is replaced only by a complete download
+      tmp_path = data_path + '.part'
+      sha = hashlib.sha256()
+      try:
+        with open(tmp_path, 'wb') as f:
+          for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+            sha.update(chunk)
+        os.replace(tmp_path, data_path)
+      finally:
+        if os.path.exists(tmp_path): # Failed download is not left in cache
+          os.remove(tmp_path)
+
+      now = time.time()
+      meta = {
+        'uri': uri,
+        'etag': r.headers.get('ETag'),
+        'last_modified': r.headers.get('Last-Modified'),
+        'sha256': sha.hexdigest(),
+        'size': os.path.getsize(data_path),
+        'fetched': now,
+        'used': now,
+      }
+      write_meta(meta_path, meta)
+  except (requests.exceptions.RequestException, OSError) as error:
+    if print_error:
+      print(error)
+    if cached_path is not None:
+      # Serve last good copy
+      return cached_path
+    return None
+
+  if evict_cache:
+    evict(cache_dir, keep=(data_path,))
+  return data_path
+
+# SHA-256 of cached copy of uri (stored with the copy, computed once when missing)
+def content_hash(uri, cache_dir=CACHE_DIR):
+  data_path, meta_path = cache_paths(uri, cache_dir)
+  meta = read_meta(meta_path) or {'uri': uri}
+  if not meta.get('sha256'):
+    sha = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+      for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        sha.update(chunk)
+    meta['sha256'] = sha.hexdigest()
+    write_meta(meta_path, meta)
+  return meta['sha256']
+
+# --- Cache eviction
+# Entries not used for max_age seconds are removed first, then the least recently used entries
+# until the whole cache fits into max_bytes.
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE, keep=()):
+  entries = []
+  for name in os.listdir(cache_dir):
+    if not name.endswith('.json'):
+      continue
+    meta_path = os.path.join(cache_dir, name)
+    data_path = meta_path[:-len('.json')] + '.csv'
+    meta = read_meta(meta_path) or {}
+    size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+    entries.append((meta.get('used', 0), size, data_path, meta_path))
+
+  now = time.time()
+  total = sum(e[1] for e in entries)
+  for used, size, data_path, meta_path in sorted(entries):
+    if data_path in keep:
+      continue
+    if now - used > max_age or total > max_bytes:
+      for path in (data_path, meta_path):
+        if os.path.exists(path):
+          os.remove(path)
+      total -= size
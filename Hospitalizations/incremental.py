@@ -0,0 +1,96 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from .data import DATASETS
+from .cube import periods
+from . import manifest
+
+# --- Incremental update of chart frames
+# For every chart the per period values (chart aggregate) and the final frames (with moving averages)
+# are stored together with a fingerprint of the raw rows of every date. On next run only periods
+# with new, revised or removed dates are aggregated again, and moving averages are recomputed only
+# from the first touched period on (plus WINDOW preceding rows needed by rolling(WINDOW, closed='left')).
+SERIES_DIR = os.environ.get('IZA_SERIES_DIR', './.cache/series')
+STATE_VERSION = 1
+
+# Chart code version - stored state of changed chart is rebuilt
+def code_version(module):
+  return '%s-%s-%s' % (STATE_VERSION, DATASETS[module.DATASET][2], manifest.code_version(manifest.chart_name(module)))
+
+# Fingerprint (hash sum, row count) of raw rows of every date, row order and Id do not matter
+def fingerprints(raw):
+  hashes = pd.util.hash_pandas_object(raw.reset_index(drop=True), index=False)
+  return pd.DataFrame({'hash': hashes.to_numpy(), 'rows': np.ones(len(raw), dtype=np.int64)}).groupby(raw['Date'].to_numpy()).sum()
+
+def state_path(module, series_dir=SERIES_DIR):
+  return os.path.join(series_dir, manifest.entry_name(module) + '.pkl')
+
+def read_state(path):
+  try:
+    with open(path, 'rb') as f:
+      return pickle.load(f)
+  except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+    return None
+
+def write_state(path, state):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'wb') as f:
+    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, path)
+
+def changed_dates(new, old):
+  common = new.index.intersection(old.index)
+  differ = (new.loc[common] != old.loc[common]).any(axis=1)
+  return new.index.difference(old.index).union(old.index.difference(new.index)).union(common[differ.to_numpy()])
+
+# Returns chart frames (same as module.prepare(raw)), recomputing only touched periods when stored state is usable
+def update(module, raw, prints=None, full=False, series_dir=SERIES_DIR):
+  path = state_path(module, series_dir)
+  version = code_version(module)
+  prints = fingerprints(raw) if prints is None else prints
+  state = None if full else read_state(path)
+
+  if state is None or state['version'] != version:
+    # --- Full rebuild
+    base = module.aggregate(raw)
+    frames = module.moving_average(base)
+  else:
+    changed = changed_dates(prints, state['fingerprints'])
+    if len(changed) == 0:
+      return state['frames']
+
+    # --- Aggregate touched periods only
+    touched = periods(changed, module.GRAIN).unique()
+    rows = raw.loc[periods(raw['Date'], module.GRAIN).isin(touched)]
+    part = module.aggregate(rows) if len(rows) else None
+    start = touched.min()
+
+    base, tails, offsets = {}, {}, {}
+    for name, old_base in state['base'].items():
+      kept = old_base.loc[~old_base.index.isin(touched)]
+      new = part[name] if part is not None else old_base.iloc[0:0]
+      base[name] = pd.concat([kept, new]).sort_index() if len(new) else kept
+      # Moving average tail - from first touched period, WINDOW preceding rows as window state
+      first = base[name].index.searchsorted(start)
+      offsets[name] = (first, max(first - module.WINDOW, 0))
+      tails[name] = base[name].iloc[offsets[name][1]:]
+
+    tails = module.moving_average(tails)
+    frames = {}
+    for name, (first, tail_start) in offsets.items():
+      frames[name] = pd.concat([state['frames'][name].iloc[:first], tails[name].iloc[first - tail_start:]])
+
+  write_state(path, {'version': version, 'fingerprints': prints, 'base': base, 'frames': frames})
+  return frames
+
+# Compare frames of incremental update with full recompute, returns list of differences
+def verify(module, raw, frames, rtol=1e-9):
+  differences = []
+  for name, expected in module.prepare(raw).items():
+    try:
+      pd.testing.assert_frame_equal(frames[name], expected, check_freq=False, check_index_type=False, rtol=rtol)
+    except AssertionError as error:
+      differences.append('%s %s: %s' % (module.__name__, name, error))
+  return differences
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+
+# --- Stage instrumentation
+# Stages of the run (fetch, parse, cleanse, aggregate, rolling, render, ...) are wrapped by
+#   with stage('parse', dataset) as s:
+#     ...
+#     s.count(rows_in=..., rows_out=..., bytes_written=...)
+# and emit one record per stage - wall time, CPU time, peak traced memory, rows and bytes - to every sink.
+# A sink is any callable taking the record (dict), JsonLines writes JSON lines to a file.
+# Disabled (no sink) stage() returns a shared no-op object, so instrumented code costs one function call.
+# Stages measured elsewhere (renders in worker processes) are recorded by emit() with their times.
+# Stages are not nested (peak traced memory is reset on every stage start). Memory tracing (tracemalloc)
+# slows down allocation heavy stages, trace_memory=False records times only.
+# IZA_TRACE=<file> (or - for stderr) enables instrumentation with JSON lines sink.
+TRACE = os.environ.get('IZA_TRACE')
+SINKS = []
+RECORDS = [] # Records of enabled run, for summary
+
+class JsonLines:
+  def __init__(self, path):
+    self.file = sys.stderr if path == '-' else open(path, 'a', encoding='utf-8')
+
+  def __call__(self, record):
+    self.file.write(json.dumps(record) + '\n')
+    self.file.flush()
+
+def enable(sink, trace_memory=True):
+  SINKS.append(JsonLines(sink) if isinstance(sink, str) else sink)
+  if trace_memory and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+def enabled():
+  return bool(SINKS)
+
+def disable():
+  del SINKS[:]
+  if tracemalloc.is_tracing():
+    tracemalloc.stop()
+
+class Stage:
+  def __init__(self, name, item):
+    self.record = {'stage': name, 'name': item, 'rows_in': None, 'rows_out': None, 'bytes': None}
+
+  def count(self, rows_in=None, rows_out=None, bytes_written=None):
+    for key, value in (('rows_in', rows_in), ('rows_out', rows_out), ('bytes', bytes_written)):
+      if value is not None:
+        self.record[key] = int(value)
+
+  def __enter__(self):
+    if tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak'):
+      tracemalloc.reset_peak()
+    self.wall = time.perf_counter()
+    self.cpu = time.process_time()
+    return self
+
+  def __exit__(self, *error):
+    self.record['wall_s'] = time.perf_counter() - self.wall
+    self.record['cpu_s'] = time.process_time() - self.cpu
+    self.record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if tracemalloc.is_tracing() else None
+    self.record['ok'] = error[0] is None
+    publish(self.record)
+    return False
+
+def publish(record):
+  record['time'] = time.time()
+  RECORDS.append(record)
+  for sink in SINKS:
+    sink(record)
+
+class NoStage:
+  def count(self, rows_in=None, rows_out=None, bytes_written=None):
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *error):
+    return False
+
+NO_STAGE = NoStage()
+
+def stage(name, item=None):
+  return Stage(name, item) if SINKS else NO_STAGE
+
+# Record of stage measured elsewhere (e.g. in worker process), peak memory is not known
+def emit(name, item, wall_s, cpu_s, ok=True, rows_in=None, rows_out=None, bytes_written=None):
+  if not SINKS:
+    return
+  record = Stage(name, item)
+  record.count(rows_in, rows_out, bytes_written)
+  record.record.update({'wall_s': wall_s, 'cpu_s': cpu_s, 'peak_mb': None, 'ok': ok})
+  publish(record.record)
+
+if TRACE:
+  enable(TRACE)
+
+def rows(frames):
+  return sum(len(frame) for frame in frames.values())
+
+def file_size(path):
+  return os.path.getsize(path) if isinstance(path, str) and os.path.exists(path) else None
+
+# --- Summary of recorded stages - wall time per chart / data set and stage, slowest one marked
+def summary(records=None):
+  records = RECORDS if records is None else records
+  if not records:
+    return
+  stages, table = [], {}
+  for record in records:
+    if record['stage'] not in stages:
+      stages.append(record['stage'])
+    row = table.setdefault(record['name'], {})
+    row[record['stage']] = row.get(record['stage'], 0) + record['wall_s']
+
+  print('%-56s' % 'chart / data set' + ''.join('%12s' % name for name in stages) + '%12s' % 'total [s]')
+  for name, row in table.items():
+    print('%-56s' % name + ''.join('%12.3f' % row[stage] if stage in row else '%12s' % '-' for stage in stages) + '%12.3f' % sum(row.values()))
+
+  slowest = max(table.items(), key=lambda item: sum(item[1].values()))
+  record = max(records, key=lambda record: record['wall_s'])
+  print('Slowest: %s (%.3f s), stage %s of %s (%.3f s)' % (slowest[0], sum(slowest[1].values()), record['stage'], record['name'], record['wall_s']))
@@ -0,0 +1,151 @@
+import os
+import json
+import hashlib
+import datetime
+
+# --- Manifest of rendered figures
+# For every output figure the manifest records a fingerprint of
+#   - input data slice (rows of visible date range incl. moving average warm-up) and release date,
+#   - chart parameters (date range, axis limits, colors, moving average window, output),
+#   - code version (chart module and shared computation modules).
+# A chart with unchanged fingerprint and existing output is not aggregated nor rendered again.
+# The manifest is stored next to the figures, so it is committed together with them.
+# Entries are named by output figure, so chart variant of other grain (render-all --grain W) has its own
+# entry, e.g. Admissions_Stacked_by_Age_Daily_W.
+MANIFEST_PATH = os.environ.get('IZA_MANIFEST', './res/Hospitalizations/manifest.json')
+PARAMS = ['DATASET', 'GRAIN', 'WINDOW', 'XLIM', 'YLIM', 'COLORS', 'AGE_BINS', 'OUTPUT']
+CODE = ['stats.py', 'data.py', 'cube.py', 'rolling.py', 'template.py']
+
+def read(path=MANIFEST_PATH):
+  try:
+    with open(path, 'r', encoding='utf-8') as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return {}
+
+def write(manifest, path=MANIFEST_PATH):
+  os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'w', encoding='utf-8') as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+    f.write('\n')
+  os.replace(tmp_path, path)
+
+def chart_name(module):
+  return module.__name__.rsplit('.', 1)[-1]
+
+# Name of chart variant of grain (None is chart default), same as entry_name of its module
+def variant_name(name, grain=None):
+  return name if grain is None else name + '_' + grain
+
+def entry_name(module):
+  return os.path.splitext(os.path.basename(module.OUTPUT))[0]
+
+# Code version of chart - hash of chart module and shared modules it is computed with (chart is not imported)
+def code_version(name):
+  sha = hashlib.sha1()
+  for path in [os.path.join(os.path.dirname(__file__), file_name) for file_name in [name + '.py'] + CODE]:
+    with open(path, 'rb') as f:
+      sha.update(f.read())
+  return sha.hexdigest()[:16]
+
+def params(module):
+  return {name: repr(getattr(module, name)) for name in PARAMS if hasattr(module, name)}
+
+# --- Date window of chart
+# Dates a chart is computed from (first, last), pushed down into loading (data.load_charts) - visible
+# range (XLIM and x axis margin) extended by one period for the lines entering and leaving it, WINDOW
+# periods of moving average warm-up (rolling(WINDOW, closed='left')) and one period more, so periods
+# of coarser grain at both ends are complete. None is all dates.
+# The warm-up is in calendar periods, rolling counts rows of chart frames - periods with values only
+# (e.g. dates with admissions or with unvaccinated admissions). Sparse data needs longer warm-up, so the
+# loaded rows are checked by warmed_up and the window of chart starts at warm_up_start of all its dates
+# then (data.load_charts). First date None is the first date of data set.
+XLIM_MARGIN = 7 # Days of x axis beyond XLIM on both sides (chart layout)
+
+def date_window(xlim, grain='D', window=0):
+  if xlim is None:
+    return None
+  from .cube import GRAIN_DAYS # Not imported by precheck.py (standard library only)
+  days = GRAIN_DAYS[grain]
+  return (xlim[0] - datetime.timedelta(days=XLIM_MARGIN + days * (window + 3)), xlim[1] + datetime.timedelta(days=XLIM_MARGIN + days * 2))
+
+# Date window of all charts of one load (None when any chart needs all dates)
+def span(windows):
+  windows = list(windows)
+  if not windows or any(window is None for window in windows):
+    return None
+  firsts = [first for first, _ in windows]
+  return None if None in firsts else min(firsts), max(last for _, last in windows)
+
+def chart_dates(module):
+  return module.dates() if hasattr(module, 'dates') else None
+
+# Dates of x axis of chart (first, last), None without XLIM
+def visible_range(module):
+  xlim = getattr(module, 'XLIM', None)
+  if xlim is None:
+    return None
+  margin = datetime.timedelta(days=XLIM_MARGIN)
+  return xlim[0] - margin, xlim[1] + margin
+
+# Per period frames of chart (module.aggregate) give the same frames in visible range from rows of
+# warm_up_start on as from all rows - every frame has WINDOW + 1 periods from it before the visible range
+# (the last one is the line entering it). Returns period of the WINDOW + 1-th row before visible range
+# of every frame (rows counted by searchsorted of frame index), None when a frame has fewer rows.
+def warm_up_start(module, base):
+  edge = visible_range(module)[0]
+  starts = []
+  for frame in base.values():
+    position = frame.index.searchsorted(edge, side='left')
+    if position <= module.WINDOW:
+      return None
+    starts.append(frame.index[position - module.WINDOW - 1])
+  return min(starts) if starts else edge
+
+# Chart computed from rows of its date window (chart_dates) has WINDOW + 1 complete periods before the
+# visible range. Charts without moving average need complete periods only.
+def warmed_up(module, base):
+  dates = chart_dates(module)
+  if not getattr(module, 'WINDOW', 0) or dates is None or visible_range(module) is None:
+    return True
+  from .cube import GRAIN_DAYS, periods
+  first = periods([dates[0]], module.GRAIN)[0]
+  if first < dates[0]: # Period of first date is not complete
+    first = periods([first + datetime.timedelta(days=GRAIN_DAYS[module.GRAIN])], module.GRAIN)[0]
+  start = warm_up_start(module, base)
+  return start is not None and start >= first
+
+# Rows the chart is computed from - rows of its own window (data.load_charts, chart dates with warm-up),
+# so the fingerprint does not depend on other charts loaded with it
+def data_fingerprint(module, raw, release_date, window=None):
+  import pandas as pd
+  from .data import between
+  window = chart_dates(module) if window is None else window
+  rows = between(raw, window)
+  sha = hashlib.sha1(str(release_date).encode('utf-8'))
+  sha.update(pd.util.hash_pandas_object(rows.reset_index(drop=True), index=False).to_numpy().tobytes())
+  return sha.hexdigest()[:16]
+
+def fingerprint(module, raw, release_date, window=None):
+  sha = hashlib.sha1()
+  sha.update(data_fingerprint(module, raw, release_date, window).encode('utf-8'))
+  sha.update(json.dumps(params(module), sort_keys=True).encode('utf-8'))
+  sha.update(code_version(chart_name(module)).encode('utf-8'))
+  return sha.hexdigest()
+
+def is_current(manifest, module, fingerprint_value):
+  entry = manifest.get(entry_name(module))
+  return entry is not None and entry.get('fingerprint') == fingerprint_value and os.path.exists(module.OUTPUT)
+
+# Source file (uri, sha256) and code version are recorded for the check before heavy imports (precheck.py)
+def record(manifest, module, fingerprint_value, release_date, source):
+  manifest[entry_name(module)] = {
+    'output': module.OUTPUT,
+    'fingerprint': fingerprint_value,
+    'code': code_version(chart_name(module)),
+    'source': source[0],
+    'source_sha256': source[1],
+    'release_date': str(release_date),
+    'rendered': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+  }
@@ -0,0 +1,63 @@
+import os
+import urllib.error
+import urllib.request
+from . import manifest
+from . import export
+from . import archive
+from .fetch import OFFLINE, CACHE_DIR, cached, location, file_path, file_etag
+
+# --- "Nothing to do" check before heavy imports
+# Standard library only (no pandas, numpy, matplotlib, requests). Work is needed when a chart is not in
+# manifest, its figure is missing, its code changed, it was rendered from another copy of the source
+# file than the cached one, or the source file changed since - HEAD request to source location
+# (fetch.location) with cached ETag / Last-Modified validators, 304 Not Modified means unchanged.
+# With export_frames=True exported frames of every chart must match its manifest fingerprint too.
+# grain checks chart variants of that grain (render-all --grain), archive_dir requires figures of their
+# release date in figure archive (render-all --archive).
+TIMEOUT = 10
+
+def source_unchanged(uri, sha256, offline=OFFLINE, cache_dir=CACHE_DIR, timeout=TIMEOUT):
+  path, meta = cached(uri, cache_dir)
+  if path is None or meta.get('sha256') != sha256:
+    return False
+  if offline:
+    return True
+
+  headers = {}
+  if meta.get('etag'):
+    headers['If-None-Match'] = meta['etag']
+  if meta.get('last_modified'):
+    headers['If-Modified-Since'] = meta['last_modified']
+  if not headers:
+    return False
+
+  url = location(uri)
+  if url.startswith('file://'):
+    try:
+      return file_etag(file_path(url)) == meta.get('etag') # Same validator as sources.FileAdapter
+    except OSError:
+      return False
+  try:
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers, method='HEAD'), timeout=timeout) as r:
+      # Server ignoring conditional request - same ETag means same content
+      return meta.get('etag') is not None and r.headers.get('ETag') == meta['etag']
+  except urllib.error.HTTPError as error:
+    return error.code == 304
+  except (urllib.error.URLError, OSError):
+    return False # Let the full run decide (it falls back to the cached copy)
+
+def nothing_to_do(charts, export_frames=False, grain=None, archive_dir=None, manifest_path=manifest.MANIFEST_PATH, offline=OFFLINE, cache_dir=CACHE_DIR):
+  rendered = manifest.read(manifest_path)
+  index = archive.read_index(archive_dir) if archive_dir else None
+  sources = {}
+  for name in charts:
+    entry = rendered.get(manifest.variant_name(name, grain))
+    if entry is None or not os.path.exists(entry['output']) or entry.get('code') != manifest.code_version(name):
+      return False
+    if export_frames and not export.is_current(manifest.variant_name(name, grain), entry['fingerprint']):
+      return False
+    if index is not None and not archive.contains(index, manifest.variant_name(name, grain), entry.get('release_date')):
+      return False
+    if sources.setdefault(entry.get('source'), entry.get('source_sha256')) != entry.get('source_sha256'):
+      return False # Charts of one data set rendered from different copies
+  return all(source_unchanged(uri, sha256, offline, cache_dir) for uri, sha256 in sources.items())
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# --- Rolling window engine
+# Rolling means / sums of all columns of a frame for several windows at once, e.g.
+#   rolling(frame, [7, 14, 28])  ->  {7: ma7 frame, 14: ma14 frame, 28: ma28 frame}
+# Values and valid (non NaN) counts of all columns are summed cumulatively once, every window is then
+# the difference of two rows of the prefix sums. Window bounds and min_periods follow pandas:
+#   days=False - frame.rolling(window, closed=closed, center=center) over rows, min_periods = window
+#   days=True  - frame.rolling('<window>D', closed=closed, center=center) over dates of index, missing
+#                dates are gaps (not rows), min_periods = 1
+# NaN values are left out, window with less than min_periods valid values is NaN. Columns are shifted by
+# integer offset (floor of column mean) before summing, so integer series stay exact and float series
+# do not lose precision to the growing cumulative sum.
+CLOSED = ['right', 'left', 'both', 'neither']
+
+# Row bounds [start, end) of window of every row (pandas FixedWindowIndexer / VariableWindowIndexer)
+def bounds(index, window, closed='left', center=False, days=False):
+  if closed not in CLOSED:
+    raise ValueError('closed must be one of ' + ', '.join(CLOSED))
+  n = len(index)
+  if not days:
+    offset = (window - 1) // 2 if center else 0
+    end = np.arange(1 + offset, n + 1 + offset)
+    start = end - window
+    if closed in ('left', 'both'):
+      start -= 1
+    if closed in ('left', 'neither'):
+      end -= 1
+    return np.clip(start, 0, n), np.clip(end, 0, n)
+
+  dates = np.asarray(index, dtype='datetime64[ns]').view(np.int64)
+  span = pd.Timedelta(days=window).value
+  if center:
+    low, high = dates - span // 2, dates + span // 2
+  else:
+    low, high = dates - span, dates
+  start = np.searchsorted(dates, low, side='left' if closed in ('left', 'both') else 'right')
+  end = np.searchsorted(dates, high, side='right' if closed in ('right', 'both') else 'left')
+  return start, np.maximum(end, start)
+
+# Prefix sums of shifted values and of valid counts, first row is zero
+def prefix_sums(values):
+  valid = ~np.isnan(values)
+  values = np.where(valid, values, 0.0)
+  count = valid.sum(axis=0)
+  offset = np.floor(np.divide(values.sum(axis=0), count, out=np.zeros(values.shape[1]), where=count > 0))
+  shifted = np.where(valid, values - offset, 0.0)
+  sums = np.zeros((len(values) + 1, values.shape[1]))
+  np.cumsum(shifted, axis=0, out=sums[1:])
+  counts = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+  np.cumsum(valid, axis=0, out=counts[1:])
+  return sums, counts, offset
+
+# Returns {window: frame} of rolling means (how='mean') or sums (how='sum') of every column of frame
+def rolling(frame, windows, how='mean', closed='left', center=False, days=False, min_periods=None):
+  values = frame.to_numpy(dtype=np.float64, na_value=np.nan)
+  if values.ndim == 1:
+    values = values[:, None]
+  sums, counts, offset = prefix_sums(values)
+
+  result = {}
+  for window in windows:
+    start, end = bounds(frame.index, window, closed, center, days)
+    n = counts[end] - counts[start]
+    total = sums[end] - sums[start] + n * offset
+    if how == 'mean':
+      with np.errstate(invalid='ignore', divide='ignore'):
+        values_out = total / n
+    elif how == 'sum':
+      values_out = total
+    else:
+      raise ValueError('how must be mean or sum')
+    minimum = (1 if days else window) if min_periods is None else min_periods
+    values_out[(n < max(minimum, 1 if how == 'mean' else 0))] = np.nan
+    if isinstance(frame, pd.Series):
+      result[window] = pd.Series(values_out[:, 0], index=frame.index, name=frame.name)
+    else:
+      result[window] = pd.DataFrame(values_out, index=frame.index, columns=frame.columns)
+  return result
+
+# Rolling means of frame for one window as columns named <column><suffix>, e.g. unvaccinated_ma7
+def moving_averages(frame, window, suffix='_ma%d', **kwargs):
+  ma = rolling(frame, [window], **kwargs)[window]
+  return ma.add_suffix(suffix % window) if isinstance(frame, pd.DataFrame) else ma.rename(str(frame.name) + suffix % window)
@@ -0,0 +1,165 @@
+import os
+import time
+import multiprocessing
+import concurrent.futures
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import pandas as pd
+
+# --- Render scheduler
+# Chart renders (figure layout, update, savefig) are CPU bound, they are spread over a pool of jobs
+# processes. Frames of a chart are copied once into a shared memory block (share) and a render job
+# gets only the handle of the block - block name and layout (dtype, rows, offset of index and every
+# column) - so frames are not pickled for every worker. Jobs may render a prefix of the shared frames
+# (rows per frame), so all archive figures of one chart are rendered from one block.
+# Rendered figure may be processed in the worker too (store, e.g. archive.store_file - PNG optimisation).
+# Every job has its own result: output and render times, or the error of a failed render, which does
+# not stop other jobs. Block is released when its last job completed. With one job (or one CPU)
+# charts are rendered one after another in this process, reusing chart figure templates.
+ALIGN = 8 # Bytes, offset of every array in block
+
+# --- Frames in shared memory
+class SharedFrames:
+  def __init__(self, frames):
+    layout, arrays, size = {}, [], 0
+    for name, frame in frames.items():
+      columns = [frame.iloc[:, i].to_numpy() for i in range(frame.shape[1])]
+      specs = []
+      for values in [frame.index.to_numpy()] + columns:
+        if values.dtype.kind not in 'biufcmM':
+          raise TypeError('frame %s has non numeric values (%s)' % (name, values.dtype))
+        specs.append((size, values.dtype.str))
+        arrays.append((size, values))
+        size += -(-values.nbytes // ALIGN) * ALIGN
+      layout[name] = {'rows': len(frame), 'index': specs[0], 'index_name': frame.index.name, 'values': specs[1:], 'columns': frame.columns}
+
+    self.block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for offset, values in arrays:
+      np.ndarray(values.shape, dtype=values.dtype, buffer=self.block.buf, offset=offset)[:] = values
+    self.handle = (self.block.name, layout)
+
+  def close(self):
+    self.block.close()
+    self.block.unlink()
+
+# Frames of shared frames handle - arrays are copied out of block (figures keep plotted data), rows is
+# number of first rows of every frame (None all rows)
+def attach(handle, rows=None):
+  block_name, layout = handle
+  block = shared_memory.SharedMemory(name=block_name)
+  try:
+    frames = {}
+    for name, spec in layout.items():
+      n = spec['rows'] if rows is None else rows[name]
+      array = lambda offset, dtype: np.ndarray(n, dtype=dtype, buffer=block.buf, offset=offset).copy()
+      index = pd.Index(array(*spec['index']), name=spec['index_name'])
+      frame = pd.DataFrame({i: array(*values) for i, values in enumerate(spec['values'])}, index=index)
+      frame.columns = spec['columns']
+      frames[name] = frame
+  finally:
+    block.close()
+  return frames
+
+# Renders chart from frames (shared frames handle or frames) with chart constants, returns output (or
+# store(output) result), wall and CPU time. Chart with other than its own constants is rendered without
+# its figure template.
+def render_job(name, frames, release_date, output, values=None, rows=None, store=None):
+  from .batch import chart_module, constants
+  from .template import plt
+  wall, cpu = time.perf_counter(), time.process_time()
+  if isinstance(frames, tuple):
+    frames = attach(frames, rows)
+  elif rows is not None:
+    frames = {key: frame.iloc[:rows[key]] for key, frame in frames.items()}
+  module = chart_module(name)
+  if values:
+    with constants(module, values):
+      fig = module.plot(frames, release_date)
+      fig.savefig(output)
+      plt.close(fig)
+  else:
+    module.render(frames, release_date, output=output)
+  if store is not None:
+    output = store(output)
+  return output, time.perf_counter() - wall, time.process_time() - cpu
+
+# Worker start - every worker waits in started() until all jobs workers are in it, so the pool has all
+# its processes (Python >= 3.9 starts workers on demand, one per submit without idle worker)
+BARRIER = None
+START_TIMEOUT = 60 # Seconds
+
+def use_barrier(barrier):
+  global BARRIER
+  BARRIER = barrier
+
+def started():
+  BARRIER.wait(START_TIMEOUT)
+  return os.getpid()
+
+# --- Scheduler of render jobs
+#   with Scheduler(jobs) as scheduler:
+#     handle = scheduler.share(frames)
+#     scheduler.submit(key, name, handle, release_date, output)
+#     for key, result, error in scheduler.results():
+#       ...
+class Scheduler:
+  def __init__(self, jobs=None):
+    self.jobs = jobs or os.cpu_count() or 1
+    self.executor = None
+    if self.jobs > 1:
+      resource_tracker.ensure_running() # Inherited by workers - blocks they attach are not unlinked at worker exit
+      barrier = multiprocessing.Barrier(self.jobs)
+      self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs, initializer=use_barrier, initargs=(barrier,))
+      for future in [self.executor.submit(started) for _ in range(self.jobs)]:
+        future.result() # All worker processes started before data sets are loaded
+    self.blocks = {} # Block name -> [block, jobs not completed]
+    self.futures = {}
+
+  def share(self, frames):
+    if self.executor is None:
+      return frames
+    block = SharedFrames(frames)
+    self.blocks[block.block.name] = [block, 0]
+    return block.handle
+
+  def release(self, frames):
+    if isinstance(frames, tuple):
+      entry = self.blocks[frames[0]]
+      entry[1] -= 1
+      if entry[1] == 0:
+        self.blocks.pop(frames[0])[0].close()
+
+  def submit(self, key, name, frames, release_date, output, values=None, rows=None, store=None):
+    if isinstance(frames, tuple):
+      self.blocks[frames[0]][1] += 1
+    if self.executor is not None:
+      future = self.executor.submit(render_job, name, frames, release_date, output, values, rows, store)
+    else:
+      future = concurrent.futures.Future()
+      try:
+        future.set_result(render_job(name, frames, release_date, output, values, rows, store))
+      except Exception as error:
+        future.set_exception(error)
+    self.futures[future] = (key, frames)
+
+  # (key, (output, wall_s, cpu_s), None) of rendered job or (key, None, error) of failed job, in order of completion
+  def results(self):
+    for future in concurrent.futures.as_completed(list(self.futures)):
+      key, frames = self.futures.pop(future)
+      self.release(frames)
+      error = future.exception()
+      yield (key, None, error) if error is not None else (key, future.result(), None)
+
+  def close(self):
+    if self.executor is not None:
+      self.executor.shutdown()
+    for block, _ in self.blocks.values():
+      block.close()
+    self.blocks.clear()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *error):
+    self.close()
+    return False
@@ -0,0 +1,319 @@
+import io
+import os
+import json
+import hashlib
+import datetime
+import threading
+import collections
+import http.server
+import urllib.parse
+import concurrent.futures
+from . import CHARTS
+from .batch import chart_module, constants
+from .data import DATASETS, DATE_FORMAT, load
+from .fetch import content_hash
+from .cube import build, GRAINS
+from . import archive
+
+# --- Local render service
+# HTTP service rendering any chart on request with its own parameters:
+#   GET  /charts                          charts, default parameters, data releases and cache statistics (JSON)
+#   GET  /chart/<chart>.<png|svg|pdf>     figure, query parameters (all optional):
+#          start=YYYY-MM-DD, end=YYYY-MM-DD   visible date range (chart XLIM)
+#          window=14                          moving average window (chart WINDOW, daily charts)
+#          bins=0,20,60                       age bins by lower bound (chart AGE_BINS, stacked chart)
+#          grain=W                            values per day, ISO week, month or quarter - D, W, M, Q (chart GRAIN)
+#   GET  /archive                         archived charts and their figures by release date (JSON)
+#   GET  /archive/<chart>/<YYYY-MM-DD>.png  archived figure of chart and release date
+#   POST /reload                          load data sets again (new release of source files)
+# Data sets are loaded once (all dates - start and end may move the date window of a chart) and kept
+# in memory as count cubes (cube.py). Figures are rendered from the cube by a pool of worker processes,
+# cubes are handed to the workers once per load (pool initializer, new pool on reload) and a request
+# sends only chart and parameters. Parameters are set as chart constants in the worker for one render,
+# so a slow render does not block other requests. Rendered images are kept in a bounded LRU cache keyed by
+# chart, format, parameters and data release, concurrent requests of one image wait for a single render.
+# Source files are read through fetch.py - IZA_OFFLINE=1 (cached copies) or IZA_SOURCE=<local mirror>
+# run the service fully offline. Archive history is served from the figure archive index (archive.py),
+# figure ETag is its content hash.
+HOST = '127.0.0.1'
+PORT = int(os.environ.get('IZA_SERVICE_PORT', 8050))
+CACHE_SIZE = 64 # Rendered images kept
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf'}
+MAX_WINDOW = 365
+
+class BadRequest(ValueError):
+  pass
+
+# Data set -> (cube, release_date) of worker process, set once per load
+CUBES = {}
+
+def use_data(data):
+  CUBES.clear()
+  CUBES.update(data)
+
+# Renders chart with parameters (chart constants) in worker process, returns image bytes
+def render_image(name, params, image_format):
+  from .template import plt
+  with constants(chart_module(name), params) as module:
+    cube, release_date = CUBES[module.DATASET]
+    fig = module.plot(module.prepare(cube), release_date)
+    image = io.BytesIO()
+    fig.savefig(image, format=image_format)
+    plt.close(fig)
+  return image.getvalue()
+
+def started():
+  return os.getpid()
+
+# --- LRU cache of rendered images
+class ImageCache:
+  def __init__(self, size=CACHE_SIZE):
+    self.size = size
+    self.images = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key):
+    image = self.images.get(key)
+    if image is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.images.move_to_end(key)
+    return image
+
+  def put(self, key, image):
+    self.images[key] = image
+    self.images.move_to_end(key)
+    while len(self.images) > self.size:
+      self.images.popitem(last=False)
+
+  def stats(self):
+    return {'images': len(self.images), 'size': self.size, 'bytes': sum(len(image) for image in self.images.values()), 'hits': self.hits, 'misses': self.misses}
+
+# --- Request parameters
+def parse_date(value, name):
+  try:
+    return datetime.datetime.strptime(value, DATE_FORMAT)
+  except ValueError:
+    raise BadRequest('%s must be a date YYYY-MM-DD' % name)
+
+# Chart constants of request, only values differing from chart defaults
+def parameters(module, query):
+  unknown = set(query) - {'start', 'end', 'window', 'bins', 'grain'}
+  if unknown:
+    raise BadRequest('unknown parameter ' + ', '.join(sorted(unknown)))
+  params = {}
+
+  if 'start' in query or 'end' in query:
+    xlim = (parse_date(query['start'], 'start') if 'start' in query else module.XLIM[0], parse_date(query['end'], 'end') if 'end' in query else module.XLIM[1])
+    if xlim[0] >= xlim[1]:
+      raise BadRequest('start must be before end')
+    params['XLIM'] = xlim
+
+  if 'window' in query:
+    if not module.WINDOW:
+      raise BadRequest('chart has no moving average')
+    try:
+      window = int(query['window'])
+    except ValueError:
+      raise BadRequest('window must be a number of days')
+    if not 1 <= window <= MAX_WINDOW:
+      raise BadRequest('window must be 1 .. %d days' % MAX_WINDOW)
+    params['WINDOW'] = window
+
+  if 'bins' in query:
+    if not hasattr(module, 'AGE_BINS'):
+      raise BadRequest('chart has no age bins')
+    try:
+      bins = [int(value) for value in query['bins'].split(',')]
+    except ValueError:
+      raise BadRequest('bins must be comma separated lower bounds of age bins, e.g. 0,20,60')
+    if any(low >= high for low, high in zip(bins[:-1], bins[1:])):
+      raise BadRequest('bins must be ascending')
+    params['AGE_BINS'] = bins
+
+  if 'grain' in query:
+    if query['grain'] not in GRAINS:
+      raise BadRequest('grain must be one of ' + ', '.join(GRAINS))
+    params['GRAIN'] = query['grain']
+
+  return {key: value for key, value in params.items() if value != getattr(module, key)}
+
+def cache_key(name, image_format, params, release):
+  return (name, image_format, tuple(sorted((key, repr(value)) for key, value in params.items())), release)
+
+# --- Service state - data sets, worker pool, image cache
+class Service:
+  def __init__(self, workers=None, cache_size=CACHE_SIZE, streaming=False, archive_dir=archive.ARCHIVE_DIR):
+    self.streaming = streaming
+    self.archive_dir = archive_dir
+    self.workers = workers
+    self.executor = None
+    self.cache = ImageCache(cache_size)
+    self.pending = {}
+    self.lock = threading.Lock()
+    self.data = {}
+    self.reload()
+
+  # Data set -> (cube, release_date, source content hash), unavailable data sets are left out
+  # Workers of new pool get the cubes once, renders already running finish in the previous pool.
+  def reload(self):
+    data = {}
+    for dataset in sorted({chart_module(name).DATASET for name in CHARTS}):
+      loaded = load(dataset, streaming=self.streaming)
+      if loaded is None:
+        print('Data set ' + dataset + ' is not available')
+        continue
+      raw, release_date = loaded
+      data[dataset] = (build(raw), release_date, content_hash(DATASETS[dataset][0]))
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=use_data,
+      initargs=({dataset: (cube, release_date) for dataset, (cube, release_date, _) in data.items()},))
+    executor.submit(started).result() # Worker processes started before requests are served
+    with self.lock:
+      previous, self.executor, self.data = self.executor, executor, data
+    if previous is not None:
+      previous.shutdown(wait=False)
+    return self.releases()
+
+  def releases(self):
+    return {dataset: {'release_date': str(release_date), 'sha256': digest} for dataset, (_, release_date, digest) in self.data.items()}
+
+  def charts(self):
+    charts = {}
+    for name in CHARTS:
+      module = chart_module(name)
+      charts[name] = {
+        'dataset': module.DATASET,
+        'start': module.XLIM[0].strftime(DATE_FORMAT),
+        'end': module.XLIM[1].strftime(DATE_FORMAT),
+        'grain': module.GRAIN,
+        'window': module.WINDOW or None,
+        'bins': getattr(module, 'AGE_BINS', None),
+        'formats': sorted(FORMATS),
+      }
+    return {'charts': charts, 'releases': self.releases(), 'cache': self.cache.stats()}
+
+  # Returns (image, cached) of chart with query parameters
+  def image(self, name, image_format, query):
+    module = chart_module(name)
+    params = parameters(module, query)
+    with self.lock:
+      if module.DATASET not in self.data:
+        raise LookupError('data set %s is not available' % module.DATASET)
+      key = cache_key(name, image_format, params, self.data[module.DATASET][2])
+      image = self.cache.get(key)
+      if image is not None:
+        return image, key, True
+      future = self.pending.get(key)
+      if future is None:
+        future = self.pending[key] = self.executor.submit(render_image, name, params, image_format)
+    try:
+      image = future.result()
+    finally:
+      with self.lock:
+        self.pending.pop(key, None)
+    with self.lock:
+      self.cache.put(key, image)
+    return image, key, False
+
+  def archive(self):
+    index = archive.read_index(self.archive_dir)
+    return {'charts': {chart: dict(archive.history(index, chart)) for chart in sorted(index['figures'])}, 'summary': archive.summary(index)}
+
+  # Blob path and content hash of archived figure, None when not archived
+  def archived(self, chart, release_date):
+    index = archive.read_index(self.archive_dir)
+    path = archive.figure(index, chart, release_date, self.archive_dir)
+    return None if path is None else (path, index['figures'][chart][release_date])
+
+  def close(self):
+    self.executor.shutdown()
+
+# --- HTTP handler
+class Handler(http.server.BaseHTTPRequestHandler):
+  def send(self, status, body, content_type='application/json', headers=()):
+    self.send_response(status)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(body)))
+    for header in headers:
+      self.send_header(*header)
+    self.end_headers()
+    if self.command != 'HEAD':
+      self.wfile.write(body)
+
+  def send_json(self, status, value):
+    self.send(status, (json.dumps(value, indent=2) + '\n').encode('utf-8'))
+
+  def send_image(self, image, content_type, etag, headers=()):
+    if self.headers.get('If-None-Match') == etag:
+      self.send_response(304)
+      self.send_header('ETag', etag)
+      return self.end_headers()
+    self.send(200, image, content_type, [('ETag', etag)] + list(headers))
+
+  def send_archived(self, path):
+    chart, _, release_date = path.rpartition('/')
+    release_date, _, image_format = release_date.rpartition('.')
+    found = self.server.service.archived(chart, release_date) if image_format == 'png' else None
+    if found is None:
+      return self.send_json(404, {'error': 'figure not in archive, see /archive'})
+    with open(found[0], 'rb') as f:
+      image = f.read()
+    self.send_image(image, FORMATS['png'], '"%s"' % found[1])
+
+  def do_GET(self):
+    service = self.server.service
+    url = urllib.parse.urlsplit(self.path)
+    try:
+      query = dict(urllib.parse.parse_qsl(url.query, strict_parsing=False))
+    except ValueError:
+      return self.send_json(400, {'error': 'invalid query'})
+
+    if url.path in ('/', '/charts'):
+      return self.send_json(200, service.charts())
+    if url.path == '/archive':
+      return self.send_json(200, service.archive())
+    if url.path.startswith('/archive/'):
+      return self.send_archived(url.path[len('/archive/'):])
+    if not url.path.startswith('/chart/'):
+      return self.send_json(404, {'error': 'not found'})
+
+    name, _, image_format = url.path[len('/chart/'):].rpartition('.')
+    if name not in CHARTS or image_format not in FORMATS:
+      return self.send_json(404, {'error': 'unknown chart or format, see /charts'})
+    try:
+      image, key, cached = service.image(name, image_format, query)
+    except BadRequest as error:
+      return self.send_json(400, {'error': str(error)})
+    except LookupError as error:
+      return self.send_json(503, {'error': str(error)})
+    except Exception as error:
+      return self.send_json(500, {'error': 'render failed: %s' % error})
+
+    etag = '"%s"' % hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+    self.send_image(image, FORMATS[image_format], etag, [('X-Cache', 'hit' if cached else 'miss')])
+
+  do_HEAD = do_GET
+
+  def do_POST(self):
+    if urllib.parse.urlsplit(self.path).path != '/reload':
+      return self.send_json(404, {'error': 'not found'})
+    self.send_json(200, {'releases': self.server.service.reload()})
+
+  def log_message(self, format, *args):
+    print('%s - %s' % (self.address_string(), format % args))
+
+def serve(host=HOST, port=PORT, workers=None, cache_size=CACHE_SIZE, streaming=False):
+  service = Service(workers, cache_size, streaming)
+  server = http.server.ThreadingHTTPServer((host, port), Handler)
+  server.daemon_threads = True
+  server.service = service
+  print('Serving charts on http://%s:%d/charts' % server.server_address[:2])
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    service.close()
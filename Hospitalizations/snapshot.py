@@ -0,0 +1,151 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# --- Columnar snapshots of parsed and cleansed data sets
+# A snapshot is a directory with one .npy file per column and meta.json, named
+#   <dataset>-<release_date>-<content hash>-v<cleansing version>
+# Columns are memory-mapped on read, so later runs skip CSV parsing and cleansing entirely.
+# Only the newest snapshot of each data set and mode (rows / streaming counts) is kept.
+# Snapshot holds all rows, read of date window (first, last) takes only rows of window: row order of
+# Date is recorded on write (source files are sorted by date), rows of window of sorted dates are then
+# one row range found by binary search of the memory-mapped Date column, so only pages of the window
+# are read. Rows of unsorted dates are selected by mask.
+SNAPSHOT_DIR = os.environ.get('IZA_SNAPSHOT_DIR', './.cache/snapshots')
+FORMAT_VERSION = 1
+DATE_COLUMN = 'Date'
+
+def snapshot_name(dataset, release_date, digest, version):
+  return '%s-%s-%s-v%s' % (dataset, release_date, digest[:16], version)
+
+def find(dataset, digest, version, snapshot_dir=SNAPSHOT_DIR):
+  if not os.path.isdir(snapshot_dir):
+    return None
+  suffix = '-%s-v%s' % (digest[:16], version)
+  for name in os.listdir(snapshot_dir):
+    if name.startswith(dataset + '-') and name.endswith(suffix):
+      return os.path.join(snapshot_dir, name)
+  return None
+
+def write_column(directory, i, series):
+  dtype = series.dtype
+  column = {'name': series.name}
+  if not isinstance(dtype, pd.CategoricalDtype) and (dtype == object or pd.api.types.is_string_dtype(dtype)):
+    series = series.astype('category')
+    dtype = series.dtype
+
+  if isinstance(dtype, pd.CategoricalDtype):
+    column['kind'] = 'category'
+    column['categories'] = [str(c) for c in dtype.categories]
+    np.save(os.path.join(directory, '%d.npy' % i), series.cat.codes.to_numpy())
+  elif pd.api.types.is_extension_array_dtype(dtype) and hasattr(dtype, 'numpy_dtype'):
+    # Nullable dtypes (e.g. Int8) - values and NA mask
+    column['kind'] = 'masked'
+    column['dtype'] = dtype.name
+    np.save(os.path.join(directory, '%d.npy' % i), series.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+    np.save(os.path.join(directory, '%d.mask.npy' % i), series.isna().to_numpy())
+  else:
+    column['kind'] = 'numpy'
+    np.save(os.path.join(directory, '%d.npy' % i), series.to_numpy())
+  return column
+
+def read_column(directory, i, column, rows=slice(None)):
+  values = np.load(os.path.join(directory, '%d.npy' % i), mmap_mode='r')[rows]
+  if column['kind'] == 'category':
+    return pd.Categorical.from_codes(values, categories=column['categories'])
+  if column['kind'] == 'masked':
+    mask = np.load(os.path.join(directory, '%d.mask.npy' % i), mmap_mode='r')[rows]
+    return pd.api.types.pandas_dtype(column['dtype']).construct_array_type()(values, mask)
+  return values
+
+# 'ascending' / 'descending' order of dates, None unsorted (or with NaT)
+def date_order(dates):
+  if np.isnat(dates).any():
+    return None
+  steps = np.diff(dates.view(np.int64))
+  if (steps >= 0).all():
+    return 'ascending'
+  if (steps <= 0).all():
+    return 'descending'
+  return None
+
+# Rows of date window (first, last) of dates, None is open - row range of sorted dates or row positions
+def window_rows(dates, window, order):
+  first, last = [None if date is None else pd.Timestamp(date).to_datetime64().astype(dates.dtype) for date in window]
+  if order is None:
+    mask = np.ones(len(dates), dtype=bool)
+    if first is not None:
+      mask &= dates >= first
+    if last is not None:
+      mask &= dates <= last
+    return np.flatnonzero(mask)
+  ascending = dates if order == 'ascending' else dates[::-1]
+  low = 0 if first is None else int(np.searchsorted(ascending, first, side='left'))
+  high = len(dates) if last is None else int(np.searchsorted(ascending, last, side='right'))
+  return slice(low, high) if order == 'ascending' else slice(len(dates) - high, len(dates) - low)
+
+def write(dataset, digest, version, raw, release_date, snapshot_dir=SNAPSHOT_DIR):
+  os.makedirs(snapshot_dir, exist_ok=True)
+  path = os.path.join(snapshot_dir, snapshot_name(dataset, release_date, digest, version))
+  tmp_path = path + '.tmp'
+  shutil.rmtree(tmp_path, ignore_errors=True)
+  os.makedirs(tmp_path)
+
+  frame = raw.reset_index()
+  meta = {
+    'format': FORMAT_VERSION,
+    'dataset': dataset,
+    'release_date': release_date,
+    'sha256': digest,
+    'version': version,
+    'index': raw.index.name if raw.index.name is not None else frame.columns[0],
+    'columns': [write_column(tmp_path, i, frame[name]) for i, name in enumerate(frame.columns)],
+  }
+  if DATE_COLUMN in frame and frame[DATE_COLUMN].dtype.kind == 'M':
+    meta['date_order'] = date_order(frame[DATE_COLUMN].to_numpy())
+  with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+    json.dump(meta, f, indent=2)
+
+  shutil.rmtree(path, ignore_errors=True)
+  os.replace(tmp_path, path)
+  collect(dataset, keep=path, version=version, snapshot_dir=snapshot_dir)
+  return path
+
+# Returns (raw, release_date) of snapshot matching content hash and cleansing version, None when not found
+# dates (first, last) returns only rows of date window, None all rows.
+def read(dataset, digest, version, dates=None, snapshot_dir=SNAPSHOT_DIR):
+  path = find(dataset, digest, version, snapshot_dir)
+  if path is None:
+    return None
+  try:
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+      meta = json.load(f)
+    if meta['format'] != FORMAT_VERSION:
+      return None
+    rows = slice(None)
+    names = [column['name'] for column in meta['columns']]
+    if dates is not None and DATE_COLUMN in names:
+      i = names.index(DATE_COLUMN)
+      rows = window_rows(np.load(os.path.join(path, '%d.npy' % i), mmap_mode='r'), dates, meta.get('date_order'))
+    frame = pd.DataFrame({column['name']: read_column(path, i, column, rows) for i, column in enumerate(meta['columns'])}, copy=False)
+  except (OSError, ValueError, KeyError):
+    return None
+  return frame.set_index(meta['index']), meta['release_date']
+
+# --- Garbage collection - remove stale snapshots of data set
+# Version is cleansing version with suffix of snapshot mode (data.load - 'c' admission counts of streaming
+# mode). Only snapshots of the same mode are stale (other releases or cleansing versions), so row and
+# counts snapshots of one release are kept side by side.
+def mode(version):
+  return str(version).lstrip('0123456789')
+
+def collect(dataset, keep=None, version=None, snapshot_dir=SNAPSHOT_DIR):
+  for name in os.listdir(snapshot_dir):
+    path = os.path.join(snapshot_dir, name)
+    if not name.startswith(dataset + '-') or path == keep:
+      continue
+    if version is not None and mode(name.rpartition('-v')[2].split('.')[0]) != mode(version):
+      continue
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,75 @@
+import io
+import os
+import email.utils
+import concurrent.futures
+import requests
+import requests.adapters
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from .fetch import OFFLINE, CACHE_DIR, fetch, evict, file_path, file_etag
+
+# --- Pooled HTTP session
+# One session per process for all downloads - kept-alive pooled connections, retries with exponential
+# backoff on connection errors and 429 / 5xx responses. file:// URLs are served by FileAdapter.
+RETRIES = int(os.environ.get('IZA_RETRIES', 3))
+BACKOFF = float(os.environ.get('IZA_BACKOFF', 0.5)) # Seconds, doubled on every retry
+POOL_SIZE = 4
+
+SESSION = None
+
+# Local files with the semantics of HTTP server - ETag / Last-Modified, 304 on matching validator
+class FileAdapter(requests.adapters.BaseAdapter):
+  def send(self, request, **kwargs):
+    response = requests.Response()
+    response.url = request.url
+    response.request = request
+    response.raw = io.BytesIO(b'')
+    path = file_path(request.url)
+    try:
+      etag = file_etag(path)
+    except OSError:
+      response.status_code, response.reason = 404, 'Not Found'
+      return response
+
+    response.headers = CaseInsensitiveDict({
+      'ETag': etag,
+      'Last-Modified': email.utils.formatdate(os.path.getmtime(path), usegmt=True),
+      'Content-Length': str(os.path.getsize(path)),
+    })
+    if request.headers.get('If-None-Match') == etag:
+      response.status_code, response.reason = 304, 'Not Modified'
+      return response
+    response.status_code, response.reason = 200, 'OK'
+    if request.method != 'HEAD':
+      with open(path, 'rb') as f: # Read whole, Response.close() does not close drained raw
+        response.raw = io.BytesIO(f.read())
+    return response
+
+  def close(self):
+    pass
+
+def retry():
+  options = dict(total=RETRIES, backoff_factor=BACKOFF, status_forcelist=[429, 500, 502, 503, 504])
+  try:
+    return Retry(allowed_methods=['HEAD', 'GET'], **options)
+  except TypeError:
+    return Retry(method_whitelist=['HEAD', 'GET'], **options) # urllib3 < 1.26
+
+def session():
+  global SESSION
+  if SESSION is None:
+    adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry())
+    SESSION = requests.Session()
+    SESSION.mount('https://', adapter)
+    SESSION.mount('http://', adapter)
+    SESSION.mount('file://', FileAdapter())
+  return SESSION
+
+# Downloads all uris concurrently, returns {uri: local path or None}
+def fetch_all(uris, offline=OFFLINE, cache_dir=CACHE_DIR, print_error=True):
+  uris = list(dict.fromkeys(uris))
+  with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(uris), 1)) as executor:
+    paths = dict(zip(uris, executor.map(lambda uri: fetch(uri, offline, cache_dir, print_error, evict_cache=False), uris)))
+  if not offline and os.path.isdir(cache_dir):
+    evict(cache_dir, keep=tuple(path for path in paths.values() if path))
+  return paths
@@ -0,0 +1,41 @@
+import os
+import sys
+import subprocess
+from . import CHARTS
+
+# --- Startup profile
+# Import time of the "nothing to do" path (CLI and precheck) and of the render path (batch runner and
+# all charts), each measured by python -X importtime in a fresh interpreter. Self time of every imported
+# module is summed by top-level package.
+PATHS = [
+  ('no-op', ['Hospitalizations.__main__', 'Hospitalizations.precheck']),
+  ('render', ['Hospitalizations.__main__', 'Hospitalizations.precheck', 'Hospitalizations.batch'] + ['Hospitalizations.' + name for name in CHARTS]),
+]
+TOP = 10 # Packages listed, the rest is summed as other
+
+def import_times(modules):
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + [p for p in [os.environ.get('PYTHONPATH')] if p]))
+  code = '; '.join('import ' + module for module in modules)
+  out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+
+  packages = {}
+  for line in out.splitlines():
+    if not line.startswith('import time:') or 'imported package' in line:
+      continue
+    self_us, _, name = line[len('import time:'):].split('|')
+    package = name.strip().split('.')[0]
+    packages[package] = packages.get(package, 0) + int(self_us)
+  return packages
+
+def profile():
+  for path, modules in PATHS:
+    packages = import_times(modules)
+    total = sum(packages.values())
+    ranked = sorted(packages.items(), key=lambda item: -item[1])
+    print('%s path: %.1f ms imports' % (path, total / 1000))
+    for package, us in ranked[:TOP]:
+      print('  %-24s %8.1f ms %5.1f %%' % (package, us / 1000, 100 * us / total))
+    other = sum(us for _, us in ranked[TOP:])
+    if other:
+      print('  %-24s %8.1f ms %5.1f %%' % ('other (%d)' % len(ranked[TOP:]), other / 1000, 100 * other / total))
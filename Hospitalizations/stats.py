@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# --- Grouped weighted statistics
+# All functions take long data (one row per observation), group it by `by` (column or index level
+# names) and optionally spread the result into columns by the categories of `columns`, e.g.:
+#   weighted_average(raw, by='Date', value='age_group', weight='Admissions', columns='Vaccinated')
+# returns one row per Date and one column per vaccination status.
+# Rows with NaN value or weight are left out, groups without any weight are NaN (no division by zero).
+
+def values(frame, name):
+  if name in frame.columns:
+    return pd.Index(frame[name], name=name)
+  return frame.index.get_level_values(name)
+
+# Numeric values as float64, NA of nullable dtypes as NaN
+def numeric(frame, name):
+  return values(frame, name).to_numpy(dtype=np.float64, na_value=np.nan)
+
+def keys(frame, by, columns=None):
+  by = [by] if isinstance(by, str) else list(by)
+  if columns is not None:
+    by = by + [columns]
+  return [values(frame, name) for name in by]
+
+# Categories of columns key - all categories of categorical, sorted values otherwise
+def categories(category):
+  return category.categories if isinstance(category, pd.CategoricalIndex) else category.unique().dropna().sort_values()
+
+# Grouped sums of w, w*x and w*x^2
+def weighted_sums(frame, by, value, weight, columns=None):
+  x = numeric(frame, value)
+  w = numeric(frame, weight)
+  valid = ~(np.isnan(x) | np.isnan(w))
+  x = np.where(valid, x, 0.0)
+  w = np.where(valid, w, 0.0)
+
+  index = keys(frame, by, columns)
+  sums = pd.DataFrame({'w': w, 'wx': w*x, 'wxx': w*x*x}).groupby(index, sort=True, observed=False).sum()
+  if columns is not None:
+    # Every category is a column, also when it has no rows
+    sums = sums.unstack(columns, fill_value=0.0)
+    sums = sums.reindex(columns=pd.MultiIndex.from_product([['w', 'wx', 'wxx'], categories(index[-1])], names=[None, columns]), fill_value=0.0)
+  return sums['w'], sums['wx'], sums['wxx']
+
+def ratio(numerator, denominator):
+  return numerator.where(denominator > 0) / denominator.where(denominator > 0)
+
+def weighted_average(frame, by, value, weight, columns=None):
+  w, wx, _ = weighted_sums(frame, by, value, weight, columns)
+  return ratio(wx, w)
+
+def weighted_var(frame, by, value, weight, columns=None):
+  w, wx, wxx = weighted_sums(frame, by, value, weight, columns)
+  mean = ratio(wx, w)
+  return (ratio(wxx, w) - mean**2).clip(lower=0)
+
+def weighted_std(frame, by, value, weight, columns=None):
+  return np.sqrt(weighted_var(frame, by, value, weight, columns))
+
+# Weighted quantile (inverted cumulative distribution - smallest value with cumulative weight >= q)
+def weighted_quantile(frame, by, value, weight, q, columns=None):
+  x = numeric(frame, value)
+  w = numeric(frame, weight)
+  valid = ~(np.isnan(x) | np.isnan(w)) & (w > 0)
+
+  keys_values = keys(frame, by, columns)
+  index = pd.MultiIndex.from_arrays(keys_values) if len(keys_values) > 1 else keys_values[0]
+  groups = index.unique().dropna().sort_values()
+  codes = groups.get_indexer(index)
+  valid = valid & (codes >= 0)
+
+  # Sort by group and value, cumulative weight over all groups
+  x, w, codes = x[valid], w[valid], codes[valid]
+  order = np.lexsort((x, codes))
+  x, w, codes = x[order], w[order], codes[order]
+  cum = np.cumsum(w)
+
+  total = np.bincount(codes, weights=w, minlength=len(groups))
+  start = np.searchsorted(codes, np.arange(len(groups)), side='left')
+  end = np.searchsorted(codes, np.arange(len(groups)), side='right')
+  before = np.concatenate(([0.0], cum))[start]
+
+  pos = np.searchsorted(cum, before + q*total, side='left')
+  pos = np.clip(pos, start, np.maximum(end - 1, start))
+  result = np.full(len(groups), np.nan)
+  has = total > 0
+  result[has] = x[pos[has]]
+
+  result = pd.Series(result, index=groups)
+  if columns is not None:
+    # Every category is a column, also when it has no valid rows (as by weighted_average)
+    category = keys_values[-1]
+    if isinstance(category, pd.CategoricalIndex):
+      names = pd.CategoricalIndex(category.categories, categories=category.categories, ordered=category.ordered, name=columns)
+    else:
+      names = pd.Index(categories(category), name=columns)
+    result = result.unstack(columns).reindex(columns=names)
+  return result
@@ -0,0 +1,42 @@
+import os
+import pandas as pd
+from .data import pa, pa_csv, arrow_options, arrow_to_pandas, PANDAS_DTYPES, convert, DATE_FORMAT
+
+# --- Streaming aggregation
+# The file is read in chunks and every chunk is folded into running admission counters per
+# (Date, age_group, Vaccinated). Peak memory depends on the number of distinct keys, not on rows.
+KEYS = ['Date', 'age_group', 'Vaccinated']
+COLUMNS = KEYS + ['Admissions']
+CHUNK_ROWS = int(os.environ.get('IZA_CHUNK_ROWS', 250000))
+CHUNK_BYTES = 16 * 1024 * 1024
+
+def chunks(path, chunk_rows=CHUNK_ROWS):
+  if pa is not None:
+    reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=CHUNK_BYTES), **arrow_options(COLUMNS))
+    for batch in reader:
+      yield convert(arrow_to_pandas(pa.Table.from_batches([batch])))
+  else:
+    for chunk in pd.read_csv(path, sep=';', usecols=COLUMNS, dtype=PANDAS_DTYPES, chunksize=chunk_rows):
+      yield convert(chunk)
+
+def fold(chunk):
+  return chunk.groupby(KEYS, observed=True, dropna=False, sort=False)['Admissions'].sum()
+
+# Returns (counts, release_date) - one row per (Date, age_group, Vaccinated) with summed Admissions
+def read_counts(path, chunk_rows=CHUNK_ROWS):
+  counters = None
+  release_date = None
+  for chunk in chunks(path, chunk_rows):
+    if len(chunk) == 0:
+      continue
+    if release_date is None:
+      release_date = chunk['Date'].iloc[0].strftime(DATE_FORMAT) # First row is the newest date
+    part = fold(chunk)
+    counters = part if counters is None else pd.concat([counters, part]).groupby(level=KEYS, observed=True, dropna=False, sort=False).sum()
+
+  if counters is None:
+    counts = convert(pd.DataFrame({c: pd.Series(dtype=PANDAS_DTYPES[c]) for c in COLUMNS}))
+  else:
+    counts = counters.reset_index()
+  counts['Admissions'] = counts['Admissions'].astype('int64')
+  return counts, release_date
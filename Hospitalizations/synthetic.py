@@ -0,0 +1,48 @@
+import os
+import numpy as np
+import pandas as pd
+from .data import DATE_FORMAT
+
+# --- Synthetic IZA hospital files
+# Same layout as OpenData_Slovakia_Covid_Hospital_AdmissionDischarge.csv / ..._UPV_AdmissionDischarge.csv:
+# ';' separated, Id;Date;age_group;Vaccinated;Admissions, newest date first (release date is the first row),
+# age_group as lower bound of 10 years group or empty (NaN), Vaccinated True / False / empty (NaN).
+# Every (Date, age_group, Vaccinated) key has rows_per_key rows (e.g. one per hospital), scale multiplies it.
+END = '2022-02-14'
+DAYS = 502 # 2020-10-01 .. 2022-02-14
+AGE_GROUPS = 11 # 0, 10, .., 100
+ROWS_PER_KEY = 20
+CHUNK_ROWS = 1000000
+
+# Mean admissions per row of data set (UPV - ventilated - is an order of magnitude smaller)
+RATES = {'admissions': 0.6, 'upv': 0.06}
+
+def generate(path, dataset='admissions', days=DAYS, age_groups=AGE_GROUPS, rows_per_key=ROWS_PER_KEY, scale=1, end=END, seed=0):
+  rng = np.random.default_rng(seed)
+  dates = pd.date_range(end=end, periods=days)[::-1].strftime(DATE_FORMAT).to_numpy()
+  ages = np.array([str(10 * i) for i in range(age_groups)] + [''], dtype=object)
+  vaccinated = np.array(['False', 'True', ''], dtype=object)
+  rows_per_key = rows_per_key * scale
+
+  # Rate by age group (older patients more often), NaN age and unknown status rarely
+  age_rate = np.append(np.linspace(0.2, 1.8, age_groups), 0.1) * RATES[dataset]
+  status_rate = np.array([1.0, 0.6, 0.2])
+  rates = np.repeat((age_rate[:, None] * status_rate[None, :]).ravel(), rows_per_key)
+  key_ages = np.repeat(np.repeat(ages, 3), rows_per_key)
+  key_status = np.repeat(np.tile(vaccinated, len(ages)), rows_per_key)
+  rows_per_day = len(rates)
+
+  days_per_chunk = max(CHUNK_ROWS // rows_per_day, 1)
+  os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+  with open(path, 'w', encoding='utf-8', newline='') as f:
+    for first in range(0, days, days_per_chunk):
+      chunk_dates = dates[first:first + days_per_chunk]
+      n = len(chunk_dates) * rows_per_day
+      chunk = pd.DataFrame({
+        'Date': np.repeat(chunk_dates, rows_per_day),
+        'age_group': np.tile(key_ages, len(chunk_dates)),
+        'Vaccinated': np.tile(key_status, len(chunk_dates)),
+        'Admissions': rng.poisson(np.tile(rates, len(chunk_dates))),
+      }, index=pd.RangeIndex(first * rows_per_day, first * rows_per_day + n, name='Id'))
+      chunk.to_csv(f, sep=';', header=first == 0)
+  return path
@@ -0,0 +1,86 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+# --- Figure templates
+# Figure layout (axes, grids, locators, formatters, axis limits, titles, legends, foot note) is built
+# once by chart layout() and reused for every render. Chart update() only swaps data of line, fill,
+# bar and stack artists and annotation texts, so rendering many variants (batch, as-of archive)
+# costs one savefig per figure.
+class Template:
+  def __init__(self, layout, update):
+    self.layout = layout
+    self.update = update
+    self.figure = None
+    self.artists = None
+
+  def render(self, frames, release_date, output):
+    first = self.figure is None
+    if first:
+      self.figure, self.artists = self.layout()
+    self.update(self.artists, frames, release_date)
+    self.figure.savefig(output)
+    if first:
+      freeze_layout(self.figure)
+
+  # Figure built from scratch (without template)
+  def plot(self, frames, release_date):
+    fig, artists = self.layout()
+    self.update(artists, frames, release_date)
+    return fig
+
+  def close(self):
+    if self.figure is not None:
+      plt.close(self.figure)
+    self.figure, self.artists = None, None
+
+# Axes positions computed by first draw are kept - constrained layout moves axes slightly on every draw
+def freeze_layout(fig):
+  if hasattr(fig, 'set_layout_engine'):
+    fig.set_layout_engine('none')
+  else:
+    fig.set_constrained_layout(False)
+
+def set_line(artist, series):
+  artist.set_data(series.index, series.values)
+
+# Fill between y1 and y2, returns current collection (replaced on matplotlib without FillBetweenPolyCollection)
+def set_fill(collection, x, y1, y2=0):
+  if hasattr(collection, 'set_data'):
+    collection.set_data(x, y1, y2)
+    return collection
+  ax = collection.axes
+  new = ax.fill_between(x, y1, y2, facecolor=collection.get_facecolor(), edgecolor=collection.get_edgecolor(),
+    linewidth=collection.get_linewidth(), label=collection.get_label(), zorder=collection.get_zorder())
+  collection.remove()
+  return new
+
+# Stacked fills of stackplot (baseline zero)
+def set_stack(collections, x, ys):
+  y = np.vstack(ys)
+  stacked = np.cumsum(y, axis=0, dtype=np.promote_types(y.dtype, np.float32))
+  collections[0] = set_fill(collections[0], x, 0, stacked[0])
+  for i in range(1, len(collections)):
+    collections[i] = set_fill(collections[i], x, stacked[i - 1], stacked[i])
+
+# Bars of container replaced by new bars
+def set_bars(ax, container, x, height, color, bottom=None, width=0.8):
+  container.remove()
+  return ax.bar(x, height, bottom=bottom, width=width, color=color)
+
+# Annotations reused for every render, missing are added and surplus removed
+def set_labels(ax, annotations, xs, ys, texts, vas, **kwargs):
+  while len(annotations) < len(texts):
+    annotations.append(ax.annotate('', xy=(0, 0), **kwargs))
+  while len(annotations) > len(texts):
+    annotations.pop().remove()
+  for annotation, x, y, text, va in zip(annotations, xs, ys, texts, vas):
+    annotation.xy = annotation.xyann = (x, y) # Text at annotated point
+    annotation.set_text(text)
+    annotation.set_va(va)
+
+# Titles and bar widths (days) of period of chart GRAIN
+GRAIN_TITLES = {'D': 'Daily', 'W': 'Weekly', 'M': 'Monthly', 'Q': 'Quarterly'}
+BAR_WIDTHS = {'D': 0.8, 'W': 5, 'M': 10, 'Q': 30}
+
+def source_note(release_date):
+  return 'Source: github.com/Institut-Zdravotnych-Analyz/covid19-data (' + str(release_date) + ')'
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Hospitalizations.cube import build, bin_labels, periods
+from Hospitalizations.data import VACCINATED, read_hospital_csv, cleanse_admissions
+from Hospitalizations.synthetic import generate
+
+# Count cube marginals must give the same values as pandas pivot tables of the rows (charts before the cube)
+@pytest.fixture(scope='module')
+def raw(tmp_path_factory):
+  path = str(tmp_path_factory.mktemp('source') / 'admissions.csv')
+  generate(path, days=100, age_groups=5, rows_per_key=2)
+  return cleanse_admissions(read_hospital_csv(path))
+
+@pytest.fixture(scope='module')
+def cube(raw):
+  return build(raw)
+
+def pivot(raw, columns):
+  return pd.pivot_table(raw, index='Date', columns=columns, values='Admissions', aggfunc='sum', fill_value=0, observed=False)
+
+def test_sum(raw, cube):
+  expected = raw.groupby('Date')['Admissions'].sum()
+  pd.testing.assert_series_equal(cube.frame(cube.sum()), expected, check_names=False, check_dtype=False)
+
+def test_sum_by_status(raw, cube):
+  expected = pivot(raw, 'Vaccinated').reindex(columns=VACCINATED)
+  np.testing.assert_array_equal(cube.sum('status'), expected.to_numpy())
+
+def test_sum_by_age(raw, cube):
+  expected = pivot(raw.dropna(subset=['age_group']), 'age_group').reindex(cube.dates, fill_value=0)
+  np.testing.assert_array_equal(cube.ages, expected.columns.to_numpy(dtype=float))
+  np.testing.assert_array_equal(cube.sum('age', known_age=True), expected.to_numpy())
+
+def test_weighted_sums(raw, cube):
+  known = raw.dropna(subset=['age_group'])
+  w, x = known['Admissions'].astype(float), known['age_group'].astype(float)
+  expected = pd.DataFrame({'w': w, 'wx': w * x, 'wxx': w * x * x}).groupby(known['Date']).sum().reindex(cube.dates, fill_value=0)
+  for values, column in zip(cube.weighted_sums(), ['w', 'wx', 'wxx']):
+    np.testing.assert_allclose(values, expected[column].to_numpy())
+
+def test_shares_by_age(raw, cube):
+  p = pivot(raw.dropna(subset=['age_group']).loc[lambda r: r['Admissions'] != 0], 'age_group')
+  expected = p.div(p.sum(axis=1), axis=0) * 100
+  shares = cube.frame(cube.shares('age'), expected.columns).loc[expected.index]
+  pd.testing.assert_frame_equal(shares, expected, check_names=False, check_dtype=False)
+
+def test_rebin(raw, cube):
+  bounds = [0, 20, 40]
+  known = raw.dropna(subset=['age_group'])
+  bins = pd.cut(known['age_group'].astype(float), bounds + [np.inf], right=False, labels=bin_labels(bounds))
+  expected = pivot(known.assign(bin=bins), 'bin').reindex(cube.dates, fill_value=0)
+  rebinned = cube.rebin(bounds)
+  np.testing.assert_array_equal(rebinned.sum('age', known_age=True), expected.to_numpy())
+  np.testing.assert_array_equal(rebinned.counts[:, -1], cube.counts[:, -1]) # Unknown age untouched
+
+def test_rebin_below_first_bound(cube):
+  rebinned = cube.rebin([50])
+  np.testing.assert_array_equal(rebinned.sum('age', known_age=True)[:, 0], cube.sum('age', known_age=True).sum(axis=1))
+  np.testing.assert_array_equal(rebinned.counts[:, -1], cube.counts[:, -1])
+  assert bin_labels([50]) == ['0+']
+  assert bin_labels([20, 60]) == ['0-59', '60+']
+
+@pytest.mark.parametrize('grain', ['W', 'M', 'Q'])
+def test_rollup(raw, cube, grain):
+  expected = raw.groupby([periods(raw['Date'], grain), 'Vaccinated'], observed=False)['Admissions'].sum().unstack().reindex(columns=VACCINATED)
+  rolled = cube.rollup(grain)
+  np.testing.assert_array_equal(rolled.dates, expected.index)
+  np.testing.assert_array_equal(rolled.sum('status'), expected.to_numpy())
+
+def test_rollup_quarter_from_month(raw):
+  direct = build(raw).rollup('Q')
+  via_month = build(raw)
+  via_month.rollup('M')
+  np.testing.assert_array_equal(via_month.rollup('Q').counts, direct.counts)
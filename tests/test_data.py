@@ -0,0 +1,18 @@
+import pandas as pd
+from Hospitalizations.data import pa, convert, read_csv_arrow, read_csv_pandas
+
+# Both CSV backends accept the same files and give the same frame, blank cells included
+SOURCE = '''Id;Date;age_group;Vaccinated;Admissions
+1;2022-02-14;70;False;2
+2;2022-02-14;;True;
+3;2022-02-13;30;;1
+'''
+
+def test_backends_give_same_frame(tmp_path):
+  path = tmp_path / 'admissions.csv'
+  path.write_text(SOURCE)
+  frame = convert(read_csv_pandas(str(path)))
+  assert frame['Admissions'].tolist() == [2, 0, 1]
+  assert frame['Admissions'].dtype == 'int32'
+  if pa is not None:
+    pd.testing.assert_frame_equal(convert(read_csv_arrow(str(path))), frame)
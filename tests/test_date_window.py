@@ -0,0 +1,66 @@
+import pytest
+import pandas as pd
+from Hospitalizations import CHARTS
+from Hospitalizations import data
+from Hospitalizations.batch import chart_module, constants, variant
+from Hospitalizations.manifest import entry_name, fingerprint
+from Hospitalizations.data import DATASETS, DATE_FORMAT, read_hospital_csv, between, load_charts
+from Hospitalizations.synthetic import generate
+
+# Rows of charts date windows (data.load_charts) must give the same frames in visible range as all rows.
+# Sparse data (one row per key, few age groups) - rows are missing on many dates, moving average warm-up
+# of WINDOW rows reaches further back than WINDOW days.
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+  raws = {}
+  for dataset, (_, cleanse, _) in DATASETS.items():
+    path = str(tmp_path_factory.mktemp('source') / (dataset + '.csv'))
+    generate(path, dataset=dataset, age_groups=3, rows_per_key=1)
+    raw = read_hospital_csv(path)
+    raws[dataset] = cleanse(raw), raw['Date'].iloc[0].strftime(DATE_FORMAT)
+  return raws
+
+@pytest.fixture
+def loads(sources, monkeypatch):
+  calls = []
+  def load(dataset, streaming=False, path=None, dates=None):
+    calls.append(dates)
+    raw, release_date = sources[dataset]
+    return between(raw, dates), release_date
+  monkeypatch.setattr(data, 'load', load)
+  return calls
+
+@pytest.mark.parametrize('grain', [None, 'W'])
+@pytest.mark.parametrize('name', CHARTS)
+def test_windowed_equals_full_load(sources, loads, name, grain):
+  module = chart_module(name)
+  with constants(module, variant(module, grain)):
+    raw, release_date = sources[module.DATASET]
+    windowed, windowed_release_date, _ = load_charts(module.DATASET, [module])
+    assert windowed_release_date == release_date
+
+    full = module.prepare(raw)
+    frames = module.prepare(windowed)
+    first, last = module.XLIM[0] - pd.Timedelta(days=7), module.XLIM[1] + pd.Timedelta(days=7)
+    for key in full:
+      entering = full[key].index[max(full[key].index.searchsorted(first) - 1, 0)] # Line entering visible range
+      pd.testing.assert_frame_equal(frames[key].loc[entering:last].astype(float), full[key].loc[entering:last].astype(float), check_freq=False)
+
+def test_sparse_warm_up_is_extended(sources, loads):
+  module = chart_module('Ventilated_Admissions_Age_WAverage_by_Vaccine_Daily')
+  raw, _, windows = load_charts(module.DATASET, [module])
+  first, last = windows[entry_name(module)]
+  assert len(loads) == 2 # Date window, then all dates once
+  assert first is not None and first < module.dates()[0] and last == module.dates()[1]
+  assert raw['Date'].min() >= first
+
+# Fingerprint of chart does not depend on other charts loaded with it (render-all --chart)
+@pytest.mark.parametrize('name', CHARTS)
+def test_fingerprint_independent_of_other_charts(sources, loads, name):
+  module = chart_module(name)
+  others = [chart_module(other) for other in CHARTS if chart_module(other).DATASET == module.DATASET]
+  fingerprints = []
+  for modules in ([module], others):
+    raw, release_date, windows = load_charts(module.DATASET, modules)
+    fingerprints.append(fingerprint(module, raw, release_date, windows[entry_name(module)]))
+  assert fingerprints[0] == fingerprints[1]
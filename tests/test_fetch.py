@@ -0,0 +1,83 @@
+import os
+import json
+import pathlib
+import threading
+import http.server
+import functools
+import pytest
+from Hospitalizations import fetch as fetch_module
+from Hospitalizations.fetch import fetch, cache_paths, location
+
+# Conditional GET - cached copy is revalidated (ETag / Last-Modified) and kept on 304 Not Modified
+CONTENT = b'Id;Date;age_group;Vaccinated;Admissions\n1;2022-02-14;70;False;2\n'
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+  def log_message(self, *args):
+    pass
+
+  def send_response(self, code, message=None):
+    self.server.statuses.append(code)
+    super().send_response(code, message)
+
+  def do_GET(self):
+    if self.path.endswith('truncated.csv'): # Body shorter than Content-Length, connection closed
+      self.send_response(200)
+      self.send_header('Content-Length', str(10 * len(CONTENT)))
+      self.end_headers()
+      self.wfile.write(CONTENT)
+      self.close_connection = True
+      return
+    super().do_GET()
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+  monkeypatch.setattr(fetch_module, 'location', functools.partial(location, source='')) # Not a mirror of IZA_SOURCE
+
+@pytest.fixture
+def server(tmp_path):
+  root = tmp_path / 'www'
+  root.mkdir()
+  (root / 'admissions.csv').write_bytes(CONTENT)
+  httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=str(root)))
+  httpd.statuses = []
+  thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+  thread.start()
+  yield httpd, 'http://127.0.0.1:%d/' % httpd.server_address[1]
+  httpd.shutdown()
+  httpd.server_close()
+
+def read_meta(uri, cache_dir):
+  with open(cache_paths(uri, cache_dir)[1], encoding='utf-8') as f:
+    return json.load(f)
+
+def test_last_modified_revalidation(server, tmp_path):
+  httpd, url = server
+  uri, cache_dir = url + 'admissions.csv', str(tmp_path / 'cache')
+  path = fetch(uri, cache_dir=cache_dir)
+  assert open(path, 'rb').read() == CONTENT
+  fetched = read_meta(uri, cache_dir)['fetched']
+
+  assert fetch(uri, cache_dir=cache_dir) == path
+  assert httpd.statuses == [200, 304]
+  assert read_meta(uri, cache_dir)['fetched'] == fetched
+
+def test_etag_revalidation(tmp_path):
+  source = tmp_path / 'admissions.csv'
+  source.write_bytes(CONTENT)
+  uri, cache_dir = pathlib.Path(source).as_uri(), str(tmp_path / 'cache')
+  path = fetch(uri, cache_dir=cache_dir)
+  meta = read_meta(uri, cache_dir)
+  assert meta['etag']
+
+  assert fetch(uri, cache_dir=cache_dir) == path
+  assert read_meta(uri, cache_dir)['fetched'] == meta['fetched'] # 304 - not downloaded again
+
+  source.write_bytes(CONTENT * 2) # New ETag
+  assert open(fetch(uri, cache_dir=cache_dir), 'rb').read() == CONTENT * 2
+  assert read_meta(uri, cache_dir)['etag'] != meta['etag']
+
+def test_failed_download_leaves_no_part_file(server, tmp_path):
+  _, url = server
+  cache_dir = str(tmp_path / 'cache')
+  assert fetch(url + 'truncated.csv', cache_dir=cache_dir, print_error=False) is None
+  assert [name for name in os.listdir(cache_dir) if name.endswith('.part')] == []
@@ -0,0 +1,44 @@
+import pytest
+import pandas as pd
+from Hospitalizations import CHARTS
+from Hospitalizations import incremental
+from Hospitalizations.batch import chart_module, constants, variant
+from Hospitalizations.data import read_hospital_csv, cleanse_admissions
+from Hospitalizations.synthetic import generate
+
+# Incremental update of stored state must give the same frames as full recompute (module.prepare)
+@pytest.fixture(scope='module')
+def raw(tmp_path_factory):
+  path = str(tmp_path_factory.mktemp('source') / 'admissions.csv')
+  generate(path, days=120, age_groups=4, rows_per_key=2)
+  return cleanse_admissions(read_hospital_csv(path))
+
+def appended(raw):
+  newest = raw['Date'].max()
+  return raw.loc[raw['Date'] < newest - 2 * pd.Timedelta(days=7)], raw
+
+def revised(raw):
+  changed = raw.copy()
+  rows = changed['Date'] == changed['Date'].min() + pd.Timedelta(days=40)
+  changed.loc[rows, 'Admissions'] += 3
+  return raw, changed
+
+def removed(raw):
+  return raw, raw.loc[raw['Date'] != raw['Date'].min() + pd.Timedelta(days=60)]
+
+@pytest.mark.parametrize('grain', [None, 'W'])
+@pytest.mark.parametrize('change', [appended, revised, removed])
+@pytest.mark.parametrize('name', CHARTS)
+def test_update_equals_full_recompute(raw, tmp_path, name, change, grain):
+  module = chart_module(name)
+  before, after = change(raw)
+  with constants(module, variant(module, grain)):
+    incremental.update(module, before, series_dir=str(tmp_path))
+    state = incremental.read_state(incremental.state_path(module, str(tmp_path)))
+    assert state is not None
+
+    frames = incremental.update(module, after, series_dir=str(tmp_path))
+    assert incremental.verify(module, after, frames) == []
+
+    # Unchanged rows - stored frames are returned as they are
+    assert incremental.verify(module, after, incremental.update(module, after, series_dir=str(tmp_path))) == []
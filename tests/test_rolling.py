@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Hospitalizations.rolling import rolling, moving_averages, CLOSED
+
+# Rolling engine must give the same values as pandas rolling (charts before the engine)
+@pytest.fixture(scope='module')
+def frame():
+  rng = np.random.default_rng(0)
+  index = pd.DatetimeIndex(np.sort(rng.choice(pd.date_range('2021-01-01', periods=120).to_numpy(), 90, replace=False)), name='Date')
+  values = rng.poisson(20, (len(index), 3)).astype(float)
+  values[rng.random(values.shape) < 0.1] = np.nan
+  values[:5, 2] = np.nan
+  return pd.DataFrame(values, index=index, columns=['unvaccinated', 'vaccinated', 'unknown'])
+
+@pytest.mark.parametrize('closed', CLOSED)
+@pytest.mark.parametrize('center', [False, True])
+@pytest.mark.parametrize('window', [1, 4, 7])
+@pytest.mark.parametrize('how', ['mean', 'sum'])
+def test_rows(frame, closed, center, window, how):
+  expected = getattr(frame.rolling(window, closed=closed, center=center), how)()
+  pd.testing.assert_frame_equal(rolling(frame, [window], how, closed, center)[window], expected)
+
+@pytest.mark.parametrize('closed', CLOSED)
+@pytest.mark.parametrize('center', [False, True])
+@pytest.mark.parametrize('window', [4, 7])
+def test_days(frame, closed, center, window):
+  expected = frame.rolling('%dD' % window, closed=closed, center=center).mean()
+  pd.testing.assert_frame_equal(rolling(frame, [window], closed=closed, center=center, days=True)[window], expected)
+
+def test_min_periods(frame):
+  expected = frame.rolling(7, closed='left', min_periods=3).mean()
+  pd.testing.assert_frame_equal(rolling(frame, [7], min_periods=3)[7], expected)
+
+def test_windows_at_once(frame):
+  result = rolling(frame, [7, 14, 28])
+  for window in [7, 14, 28]:
+    pd.testing.assert_frame_equal(result[window], frame.rolling(window, closed='left').mean())
+
+def test_integer_series_exact():
+  series = pd.Series(np.arange(10 ** 9, 10 ** 9 + 50, dtype=np.int64), name='Admissions')
+  pd.testing.assert_series_equal(rolling(series, [7], 'sum')[7], series.rolling(7, closed='left').sum())
+
+def test_moving_averages(frame):
+  expected = frame.rolling(7, closed='left').mean().add_suffix('_ma7')
+  pd.testing.assert_frame_equal(moving_averages(frame, 7), expected)
@@ -0,0 +1,17 @@
+import gc
+import pathlib
+import warnings
+import functools
+from Hospitalizations import fetch as fetch_module
+from Hospitalizations.fetch import fetch, location
+
+# file:// sources are served by sources.FileAdapter - the source file is closed by the download
+def test_file_fetch_closes_source(tmp_path, monkeypatch):
+  monkeypatch.setattr(fetch_module, 'location', functools.partial(location, source='')) # Not a mirror of IZA_SOURCE
+  source = tmp_path / 'admissions.csv'
+  source.write_text('Id;Date;age_group;Vaccinated;Admissions\n1;2022-02-14;70;False;2\n')
+  with warnings.catch_warnings(record=True) as caught:
+    warnings.simplefilter('always', ResourceWarning)
+    assert fetch(pathlib.Path(source).as_uri(), cache_dir=str(tmp_path / 'cache')) is not None
+    gc.collect()
+  assert [str(w.message) for w in caught if issubclass(w.category, ResourceWarning)] == []
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from Hospitalizations.stats import weighted_average, weighted_quantile
+
+# Grouped weighted statistics - same shape for the same columns, empty groups are NaN
+def frame():
+  return pd.DataFrame({
+    'Date': pd.to_datetime(['2022-02-13', '2022-02-13', '2022-02-13', '2022-02-14', '2022-02-14']),
+    'age_group': [25.0, 75.0, np.nan, 45.0, 65.0],
+    'Vaccinated': pd.Categorical(['unvaccinated', 'vaccinated', 'unknown', 'unvaccinated', 'unvaccinated'], categories=['unvaccinated', 'vaccinated', 'unknown']),
+    'Admissions': [2, 1, 4, 1, 3],
+  })
+
+def test_quantile_has_columns_of_average():
+  raw = frame()
+  average = weighted_average(raw, 'Date', 'age_group', 'Admissions', columns='Vaccinated')
+  median = weighted_quantile(raw, 'Date', 'age_group', 'Admissions', 0.5, columns='Vaccinated')
+  pd.testing.assert_index_equal(median.columns, average.columns)
+  pd.testing.assert_index_equal(median.index, average.index)
+  assert median['unknown'].isna().all() # No valid rows (NaN age_group)
+  assert np.isnan(median.loc['2022-02-14', 'vaccinated']) # No rows
+  assert median.loc['2022-02-14', 'unvaccinated'] == 65.0
+
+def test_average():
+  average = weighted_average(frame(), 'Date', 'age_group', 'Admissions')
+  np.testing.assert_allclose(average.to_numpy(), [(2 * 25 + 75) / 3, (45 + 3 * 65) / 4])